@@ -15,6 +15,7 @@ GreedySolver method summary:
     - After the 1st pass, the target is scanned again
     - Shapes with 75% coverage (3 out of 4 tiles) are force fitted, to maximise solution accuracy
     - This approach is greedy in that it fits the best tile available at each position, without regard for future consequences
+    - The shape chosen at each position depends only on the 10 surrounding elements, so is found from a table built at import
 
 RecuSolver method summary:
     - Scan the target for a 1
@@ -23,11 +24,100 @@ RecuSolver method summary:
     - If a solution is impossible, backtrack one level, and try another shape
     - If a solution is still impossible, backtrack again
     - Continue with this brute-force approach until a perfect solution is found
+    - Remaining targets already proven impossible are remembered (by Zobrist hash), so are never searched twice
+    - The recursion uses an explicit stack, and can be given time and node limits
+    - If no perfect solution is found (in time), the partial solution with the most shapes placed is returned instead
+    - After each shape is fitted, prune the branch early if a free element next to it can no longer be covered, or if...
+      ... it closes off a pocket that is not a multiple of 4 elements, or is too unbalanced on a chessboard colouring
+
+BitboardSolver method summary:
+    - Identical decisions (and therefore an identical solution) to GreedySolver
+    - The target and the 'already tiled' state are held as one integer bitmask per row
+    - The neighbourhood around each root is read with a few shifts and ANDs, rather than up to 26 list lookups
+    - Rows are scanned by jumping between set bits, so 0s in the target cost nothing
+
+StreamSolver method summary:
+    - Identical tiling to GreedySolver, for targets read row by row (e.g. from a memory-mapped file)
+    - Each row is solved greedily once the 2 rows below it have been read, and force fitted 2 rows after that
+    - Finished solution rows are passed on straight away and dropped, so only a few rows are held at a time
+
+VectorGreedySolver method summary:
+    - Identical decisions (and therefore an identical solution) to GreedySolver, computed with NumPy
+    - A root's decision only depends on roots up to 2 rows above it and 4 columns to the right, so roots along...
+      ... each 'skewed diagonal' (j + 5i constant) are independent, and are evaluated together as one array operation
+    - Both the greedy pass and the force fit pass are swept diagonal by diagonal, using lookup tables for the shape choice
+
+BandSolver method summary:
+    - Split the target into horizontal bands, one per worker process, and solve each greedily
+    - Remove the pieces within a couple of rows of each band boundary, and re-solve that region across the boundary
+    - Keep the re-solved region only if it reduces the number of missing and excess blocks, then renumber the pieces
+
+ExactSolver method summary:
+    - Treat tiling as an exact cover problem: every 1 in the target must be covered by exactly one placement
+    - Search it with Dancing Links, always branching on the target element with the fewest remaining placements
+    - Solve any pocket of elements closed off by a placement straight away, and reject pockets that are not a multiple of 4
+    - On a dead end, jump back to the latest placement responsible for it, rather than just the previous placement
+    - Restart with a shuffled shape order (and a larger node limit) if a region takes too long
+
+TilingLibrary method summary:
+    - Enumerate every connected region of up to 12 elements offline, and find the most pieces that fit in each
+    - Store the tilings in a binary file, keyed by a hash of each region's shape in a canonical rotation / reflection
+    - Look up small regions met by the solvers by their shape, and map the stored tiling back onto them
+
+RegionSolver method summary:
+    - Label the connected regions of 1s in the target, with whole-array NumPy operations
+    - Look up the perfect tiling of each very small region in the tiling library, if it has one
+    - Tile each small region perfectly (via ExactSolver, within a node budget), in parallel if there are several workers
+    - Solve large regions, and any small regions with no perfect tiling, with the greedy approach
+    - Optionally improve the result with LocalSearch, given a time budget
+
+BeamSolver method summary:
+    - Scan the target in the same order as GreedySolver, but keep the best few partial tilings at each root
+    - Extend each by every shape that fits (or by leaving the root uncovered), and rank them by the 1s left uncovered...
+      ... plus the 1s next to each new piece that can no longer be covered
+    - Hold only bitmasks of the elements ahead of the scan, and share the list of pieces between partial tilings
+
+MultiStartSolver method summary:
+    - Solve the target greedily in each of its 8 rotations / reflections, so the scan runs in every direction
+    - Then solve further variants with ties between minimum cost shapes broken at random (seeded)
+    - Run the variants across worker processes, within a time budget, and keep the one with the fewest missing + excess elements
+
+PortfolioSolver method summary:
+    - Measure cheap features of the target (number and density of 1s, sizes of its regions) to judge if a perfect tiling...
+      ... is possible, and likely to be found within a deadline
+    - If so, run the greedy approach and an exact solver at the same time, in separate processes, with a single greedy...
+      ... pass in this process as a fallback
+    - At the deadline (or on a perfect tiling), terminate the processes still running, and return the best solution so far
+
+LocalSearch method summary:
+    - Rank small windows of the solution by their number of missing and excess elements
+    - Remove the pieces touching each window, and re-tile the freed elements optimally with a memoised search
+    - Keep the new pieces only if they reduce the number of missing + excess elements
 
 Due to the brute-force nature of the recursive (RecuSolver) approach, it is only used for small grids (of less than 100 elements).
-For anything larger, the much more efficient, but invariably imperfect greedy approach is used
+For targets of up to 40000 elements, the target is split into regions (via RegionSolver): small regions are tiled...
+... perfectly, and for the rest the much more efficient, but invariably imperfect greedy approach is used (via BitboardSolver)
+For anything larger, splitting costs several times a greedy solve for a small gain, so the greedy approach is used alone
+Perfect tilings of much larger targets (several thousand elements) can be requested with Tetris(T, exact=True), via ExactSolver
+Tetris(T, pieces=True) returns a compact list of pieces (a PieceList) instead of the solution matrix, which it can still be read as
 '''
 
+import hashlib
+import inspect
+import os
+import queue
+import random
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from itertools import count, islice
+from multiprocessing import Pipe, Pool, Process
+from multiprocessing.connection import wait as wait_ready
+
+import numpy as np
+
+
 class Tetromino:
     '''
     The Tetromino class stores data for each of the 16 valid pieces
@@ -56,8 +146,63 @@ class Tetromino:
         return path
 
 
+class SolverStats:
+    '''
+    Statistics recorded by an instrumented solver (see Solver.instrument)
+        - timings: total seconds spent in each phase of solving (e.g. 'greedy' and 'force_fit')
+        - calls: number of calls of each of the solver's counted_methods
+        - counts: other counters of the solver (e.g. RecuSolver's transposition table and pruning counts)
+        - nodes, backtracks and max_depth: search statistics (nodes are also counted by ExactSolver, summed over its searches)
+    callback, if given, is called as callback(event, stats) at the end of each phase (event 'phase'), and every...
+    ... report_every nodes of RecuSolver's search (event 'progress'), so long searches can be monitored as they run
+    '''
+    def __init__(self, callback=None, report_every=10000):
+        self.timings, self.calls, self.counts = {}, {}, {}
+        self.nodes = self.backtracks = self.max_depth = 0
+        self.callback = callback
+        self.report_every = report_every
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + time.perf_counter() - start
+            if self.callback:
+                self.callback('phase', self)
+
+    def count_calls(self, name, method):
+        '''Returns the bound method wrapped to count its calls in self.calls[name]'''
+        calls = self.calls
+        calls[name] = 0
+
+        def counted(*args):
+            calls[name] += 1
+            return method(*args)
+        return counted
+
+    def progress(self, nodes, backtracks, depth):
+        self.nodes, self.backtracks = nodes, backtracks
+        self.max_depth = max(self.max_depth, depth)
+        if self.callback:
+            self.callback('progress', self)
+
+    def as_dict(self):
+        return {'timings': dict(self.timings), 'calls': dict(self.calls), 'counts': dict(self.counts),
+                'nodes': self.nodes, 'backtracks': self.backtracks, 'max_depth': self.max_depth}
+
+
+def as_lists(T):
+    '''Converts a target given as a NumPy array (e.g. from load_target) into the list of lists used by the solvers'''
+    return T.tolist() if isinstance(T, np.ndarray) else T
+
+
 class Solver:
     piece_id = 0
+    stats = None                # SolverStats, once instrumented (see instrument)
+    counted_methods = ('find_window_key', 'find_force_fit_shape', 'fit_shape', 'backtrack', 'is_dead_end', 'find_root',
+                       'greedy_row', 'force_fit_row', 'select', 'find_pockets')
 
     position_eval_data = [
         [(1, 0), {4, 5, 7, 8, 10, 11, 12, 13, 14, 16, 17, 19}],     # The tuple in each array specifies a relative postion from a root
@@ -94,13 +239,40 @@ class Solver:
     '''Lines 97 - 137 contain methods used and inherited by both the GreedySolver and RecuSolver subclasses'''
 
     def __init__(self, T):
-        T = [[None, None] + r + [None, None] for r in T]        # Pad the target with None values, to avoid special treatment of edge pieces 
+        T = [[None, None] + r + [None, None] for r in as_lists(T)]     # Pad the target with None values, to avoid special treatment of edge pieces 
         self.cols = len(T[0])                                   # Numpy.pad() not compatible with NoneType, hence not used
         row_pad = [None for c in range(self.cols)]              # NoneType used for performance reasons (see line 129)
         self.T = [row_pad, row_pad] + T + [row_pad, row_pad]
         self.rows = len(self.T)
         self.S = [[(0, 0) for c in range(self.cols)] for r in range(self.rows)]     # Initialise solution matrix of (0, 0) tuples
 
+    def instrument(self, callback=None, report_every=10000):
+        '''
+        Starts recording statistics in self.stats (see SolverStats), and returns it
+        Each of counted_methods that the solver has is replaced by a counting wrapper on this instance only, and...
+        ... uninstrumented solvers only check self.stats once per phase (or per search node), so cost next to nothing
+        '''
+        self.stats = SolverStats(callback, report_every)
+        for name in self.counted_methods:
+            if hasattr(self, name):
+                setattr(self, name, self.stats.count_calls(name, getattr(self, name)))
+        return self.stats
+
+    def phase(self, name):
+        '''Context manager timing a phase of solving in self.stats, if instrumented'''
+        return self.stats.phase(name) if self.stats else nullcontext()
+
+    def solve_pieces(self):
+        '''
+        Solves the target, returning a PieceList rather than a solution matrix (with the same piece IDs as solve)
+        Solvers with solve_placements (unpadded, and numbered in root order by solve) never build the matrix
+        '''
+        if not hasattr(self, 'solve_placements'):
+            return PieceList.from_solution(self.solve())
+        placements = self.solve_placements()
+        placements.sort(key=lambda p: (p[1], p[2]))
+        return PieceList.from_placements(placements, self.height, self.width)
+
     def find_shapes(self, i, j):
         '''
         Function checks the target in various positions around the root at (i, j)
@@ -112,6 +284,17 @@ class Solver:
                 valid_set = valid_set - p[1]            # Remove those shapes from the valid_set
         return valid_set
 
+    def find_window_key(self, i, j):
+        '''
+        Packs the 10 positions of self.position_eval_data around the root at (i, j) into an integer, with bit k set if...
+        ... the element at position k is a 1 which has not been tiled yet
+        The key indexes greedy_table and costed_table, which replace find_shapes and the costing of each valid shape
+        '''
+        r0, r1, r2 = self.T[i], self.T[i + 1], self.T[i + 2]     # "or 0" maps None (already filled) to 0, preserving 0s and 1s
+        return ((r1[j] or 0) | (r0[j + 1] or 0) << 1 | (r1[j + 1] or 0) << 2 | (r1[j - 1] or 0) << 3 | (r2[j] or 0) << 4
+                | (r0[j + 2] or 0) << 5 | (r1[j + 2] or 0) << 6 | (r2[j + 1] or 0) << 7 | (r2[j - 1] or 0) << 8
+                | (r1[j - 2] or 0) << 9)
+
     def find_shape_cost(self, i, j, shape_id):
         ''' 
         Function works around a specified shape's outline_path, with the root at (i, j) in the target matrix
@@ -138,22 +321,23 @@ class Solver:
 
 class GreedySolver(Solver):
     def solve(self):
-        for i in range(2, self.rows - 2):                   # Iterate through target matrix
-            for j in range(2, self.cols - 2):
-                if not self.T[i][j]:                        # If target is zero or already filled, move on
-                    continue
-                valid_set = self.find_shapes(i, j)
-                if not valid_set:                           # If no shapes fit, move on
-                    continue
-                min_cost_shape_id = self.find_min_cost_shape(i, j, valid_set)
-                self.fit_shape(i, j, min_cost_shape_id)     # Fit the minimum cost shape
-        for i in range(2, self.rows - 2):                   # Force fit pass
-            for j in range(2, self.cols - 2):
-                if not self.T[i][j]:
-                    continue
-                ff_shape_id = self.find_force_fit_shape(i, j)
-                if ff_shape_id:
-                    self.fit_shape(i, j, ff_shape_id)
+        with self.phase('greedy'):
+            for i in range(2, self.rows - 2):               # Iterate through target matrix
+                for j in range(2, self.cols - 2):
+                    if not self.T[i][j]:                    # If target is zero or already filled, move on
+                        continue
+                    min_cost_shape_id = self.greedy_table[self.find_window_key(i, j)]     # Equivalent to find_shapes and find_min_cost_shape
+                    if not min_cost_shape_id:               # If no shapes fit, move on
+                        continue
+                    self.fit_shape(i, j, min_cost_shape_id) # Fit the minimum cost shape
+        with self.phase('force_fit'):
+            for i in range(2, self.rows - 2):               # Force fit pass
+                for j in range(2, self.cols - 2):
+                    if not self.T[i][j]:
+                        continue
+                    ff_shape_id = self.find_force_fit_shape(i, j)
+                    if ff_shape_id:
+                        self.fit_shape(i, j, ff_shape_id)
         self.S = [row[2:-2] for row in self.S[2:-2]]        # Remove padding from solution matrix and return
         return self.S
 
@@ -183,33 +367,209 @@ class GreedySolver(Solver):
 
 
 class RecuSolver(Solver):
-    def solve(self):                                        # Calls the recursive function, and awaits a solution
-        self.recurse()
+    '''
+    The recursion is run with an explicit stack (see search), so it is not limited by the recursion depth, and it stops...
+    ... early once time_limit seconds have passed or node_limit shapes have been tried (if given)
+    The deepest partial tiling reached is kept in self.best, and returned if no perfect tiling is found, unless the...
+    ... greedy solution of the target has fewer missing + excess elements (see best_partial)
+    The remaining problem depends only on which elements have been tiled, not the order they were tiled in, so...
+    ... remaining targets already proven impossible are kept in a transposition table (self.dead) and not searched again
+    Each is identified by a Zobrist hash (self.hash): the XOR of a random 64 bit key for each tiled element, updated...
+    ... incrementally by fit_shape and backtrack
+    The table holds at most dead_limit hashes, evicting the least recently used, and its use is counted in...
+    ... self.hits, self.misses and self.evictions
+    After each shape is fitted, the free elements next to it are checked with the pruning rules named in pruning...
+    ... (see is_dead_end), and the shape is removed straight away if the rest of the target cannot be tiled
+    The number of shapes removed by each rule is counted in self.prunes
+    A target with a region that is not a multiple of 4 elements has no perfect tiling, so the perfect search is skipped...
+    ... and, if time_limit or node_limit is given, the search is run for the best partial tiling without pruning (every...
+    ... rule assumes a perfect tiling, so the 'size' rule would otherwise prune every shape once the rest closes into a pocket)
+    '''
+    dead_limit = 1000000
+    pocket_size = 64            # Closed pockets of free elements up to this size are checked by the 'size' and 'colour' rules
+
+    def __init__(self, T, time_limit=None, node_limit=None, pruning=('size',)):
+        super().__init__(T)
+        self.target = as_lists(T)                           # Unpadded, and never changed by the search (see best_partial)
+        keys = random.Random(0)                             # Seeded, so runs are reproducible
+        self.zobrist = [[keys.getrandbits(64) for c in range(self.cols)] for r in range(self.rows)]
+        self.hash = 0
+        self.dead = {}                                      # Hashes of impossible remaining targets, least recently used first
+        self.hits = self.misses = self.evictions = 0
+        self.time_limit, self.node_limit = time_limit, node_limit
+        self.nodes = self.backtracks = 0
+        self.best = []                                      # (shape_id, i, j) placements of the deepest partial tiling
+        self.pruning = set(pruning)
+        self.prunes = dict.fromkeys(self.pruning, 0)
+
+    def solve(self):                                        # Runs the search, and awaits a solution
+        cells, starts = label_regions(self.target)
+        with self.phase('search'):
+            if not np.any(np.diff(starts) % 4):         # Every region could be tiled perfectly
+                self.perfect = self.search()
+            else:
+                self.perfect = False
+                if self.time_limit or self.node_limit:  # Search for the best partial tiling, with no pruning
+                    pruning, self.pruning = self.pruning, set()
+                    self.search()
+                    self.pruning = pruning
+        if self.stats:                                      # The deepest partial tiling gives the maximum depth
+            self.stats.progress(self.nodes, self.backtracks, len(self.best))
+            self.stats.counts.update(hits=self.hits, misses=self.misses, evictions=self.evictions)
+            self.stats.counts.update(('pruned_' + rule, n) for rule, n in self.prunes.items())
+        if not self.perfect:                                # Return the best partial tiling instead
+            return self.best_partial()
         self.S = [row[2:-2] for row in self.S[2:-2]]        # Remove padding from solution matrix and return
         return self.S
 
-    def recurse(self):
-        for i in range(2, self.rows - 2):                   # Iterate through the target
-            for j in range(2, self.cols - 2):
-                if not self.T[i][j]:                        # If target is zero or already filled, move on
+    def best_partial(self):
+        '''
+        Returns the solution of the deepest partial tiling, or the greedy solution if that has fewer missing + excess elements
+        The search never leaves a 1 uncovered, so a 1 that no shape can cover early in the scan ends it with a shallow...
+        ... partial tiling, where the greedy approach covers the 1s around it
+        '''
+        height, width = self.rows - 4, self.cols - 4
+        greedy = BitboardSolver(self.target).solve()
+        greedy_error = sum(bool(t) != (s[1] > 0) for rt, rs in zip(self.target, greedy) for t, s in zip(rt, rs))
+        ones = sum(bool(t) for row in self.target for t in row)
+        if greedy_error < ones - 4 * len(self.best):      # A partial tiling only covers 1s, so its errors are the 1s it misses
+            return greedy
+        return placements_to_solution(self.best, height, width, pad=2)
+
+    def search(self):
+        '''
+        Equivalent of recursively fitting each shape at the first remaining 1, and trying to solve the remaining problem
+        Each level of the explicit stack is (i, j, shape_ids, k): the root, the shapes that fit there (minimum cost first)...
+        ... and the index of the shape currently placed
+        Returns True once a perfect tiling is found, or False if there is none, or a limit is reached first
+        '''
+        deadline = self.time_limit and time.perf_counter() + self.time_limit
+        stats = self.stats
+        stack = []
+        i, j = 2, 2
+        while True:
+            root = self.find_root(i, j)                     # All 1s before the last root are tiled, so scan on from there
+            if root is None:                                # No 1s remain
+                return True
+            i, j = root
+            self.nodes += 1
+            if self.node_limit and self.nodes > self.node_limit:
+                return False
+            if deadline and not self.nodes & 255 and time.perf_counter() > deadline:
+                return False
+            if stats and not self.nodes % stats.report_every:
+                stats.progress(self.nodes, self.backtracks, len(stack))
+            known_dead = self.hash in self.dead             # This remaining target has already been proven impossible
+            if known_dead:
+                self.hits += 1
+                self.dead[self.hash] = self.dead.pop(self.hash)     # Move to the end, so it is evicted last
+                shape_ids = ()
+            else:
+                self.misses += 1
+                shape_ids = self.costed_table[self.find_window_key(i, j)]   # Shapes that fit, minimum cost first (see find_costed_array)
+            k = 0
+            while True:
+                while k == len(shape_ids):                  # No shapes left to try here, so backtrack
+                    if not known_dead:
+                        self.add_dead()
+                    known_dead = False
+                    if not stack:
+                        return False
+                    i, j, shape_ids, k = stack.pop()
+                    self.backtrack(i, j, shape_ids[k])      # Remove the shape and try the next in shape_ids
+                    k += 1
+                self.fit_shape(i, j, shape_ids[k])
+                if len(stack) >= len(self.best):            # A pruned partial tiling is still a partial tiling
+                    self.best = [(level[2][level[3]], level[0], level[1]) for level in stack] + [(shape_ids[k], i, j)]
+                if not self.pruning or not self.is_dead_end(i, j, shape_ids[k]):
+                    break
+                self.backtrack(i, j, shape_ids[k])
+                k += 1
+            stack.append((i, j, shape_ids, k))
+
+    def is_dead_end(self, i, j, shape_id):
+        '''
+        Checks the free elements next to a newly fitted shape with the rules in self.pruning, returning True if any fails
+            - 'isolated': every such element must still be coverable by some shape
+            - 'size': every closed pocket of free elements (up to pocket_size) must be a multiple of 4 elements
+            - 'colour': on a chessboard colouring, every shape covers 2 black and 2 white elements except...
+              ... T shapes (3 and 1), so a closed pocket of n elements cannot have more than n / 2 extra of either colour
+        Measured on random 10x10 targets at density 0.85 whose regions are all multiples of 4 (73 of 400 seeds):
+            - No pruning: 1.2s for the 72 easy targets, and 314k nodes (1.3s) for the hard one
+            - 'size': 1.3s, and 70k nodes (2.8s): the fewest nodes for the least cost per node, so it is the default
+            - 'isolated': 1.5s, and 70k nodes (3.4s), saving no more nodes than 'size' at a higher cost per node
+            - 'colour': 2.6s, and 113k nodes (3.3s); with 'size' on as well, it pruned no shapes at all
+        '''
+        T = self.T
+        checked = set()
+        for p in self.shapes[shape_id].footprint:
+            a, b = i + p[0], j + p[1]
+            for start in ((a - 1, b), (a + 1, b), (a, b - 1), (a, b + 1)):
+                if not T[start[0]][start[1]] or start in checked:
+                    continue
+                checked.add(start)
+                if 'isolated' in self.pruning and not self.is_coverable(*start):
+                    self.prunes['isolated'] += 1
+                    return True
+                if 'size' not in self.pruning and 'colour' not in self.pruning:
+                    continue
+                pocket, frontier, balance = {start}, [start], 0    # Flood fill from start, giving up once it exceeds pocket_size
+                while frontier and len(pocket) <= self.pocket_size:
+                    c, d = frontier.pop()
+                    balance += 1 if (c + d) % 2 else -1
+                    for q in ((c - 1, d), (c + 1, d), (c, d - 1), (c, d + 1)):
+                        if T[q[0]][q[1]] and q not in pocket:
+                            pocket.add(q)
+                            frontier.append(q)
+                checked |= pocket
+                if frontier:
                     continue
-                valid_set = self.find_shapes(i, j)          # Find shapes that fit
-                costed_shapes_array = self.find_costed_array(i, j, valid_set)   # Try the minimum cost shapes first (see line XX)
-                for cost_tuple in costed_shapes_array:      # For each shape that fits
-                    self.fit_shape(i, j, cost_tuple[0])     # Place it...
-                    if self.recurse():                      # Try and solve the remaining problem (with n-1 shapes)
-                        return True
-                    else:
-                        self.backtrack(i, j, cost_tuple[0]) # backtrack 1 level (remove the shape and try the next in costed_shapes_array)
-                return False                                # No shapes fit
-        return True                                         # No 1s remain
+                if 'size' in self.pruning and len(pocket) % 4:
+                    self.prunes['size'] += 1
+                    return True
+                if 'colour' in self.pruning and 2 * abs(balance) > len(pocket):
+                    self.prunes['colour'] += 1
+                    return True
+        return False
+
+    def is_coverable(self, a, b):
+        '''Returns whether any shape fits over the free element at (a, b) (with (a, b) as any of its 4 tiles)'''
+        T = self.T
+        for offsets in self.cover_offsets:
+            if all(T[a + o[0]][b + o[1]] for o in offsets):
+                return True
+        return False
+
+    def find_root(self, i, j):
+        '''Returns the position of the first remaining 1 at or after (i, j), scanning top - bottom, left - right'''
+        for a in range(i, self.rows - 2):
+            row = self.T[a]
+            for b in range(j if a == i else 2, self.cols - 2):
+                if row[b]:
+                    return a, b
+        return None
+
+    def add_dead(self):
+        '''Records the current remaining target as impossible, evicting the least recently used entry if the table is full'''
+        self.dead[self.hash] = True
+        if len(self.dead) > self.dead_limit:
+            del self.dead[next(iter(self.dead))]
+            self.evictions += 1
+
+    def fit_shape(self, i, j, shape_id):
+        '''Places a tile as in Solver.fit_shape, updating self.hash'''
+        super().fit_shape(i, j, shape_id)
+        for p in self.shapes[shape_id].footprint:
+            self.hash ^= self.zobrist[i + p[0]][j + p[1]]
 
     def backtrack(self, i, j, shape_id):
         '''Removes a shape from the target if recursion fails'''
         self.piece_id -= 1
+        self.backtracks += 1
         for p in self.shapes[shape_id].footprint:
             self.S[i + p[0]][j + p[1]] = (0, 0)
             self.T[i + p[0]][j + p[1]] = 1
+            self.hash ^= self.zobrist[i + p[0]][j + p[1]]
 
     def find_costed_array(self, i, j, valid_set):
         '''
@@ -225,11 +585,2093 @@ class RecuSolver(Solver):
         return costed_shapes_array
 
 
-def Tetris(T):
+def build_window_tables():
+    '''
+    Builds the lookup tables indexed by Solver.find_window_key, so the per-root decision is a single list index
+        - Solver.greedy_table[key] is the shape ID chosen by GreedySolver.find_min_cost_shape (or None if no shapes fit)
+        - Solver.costed_table[key] is the tuple of shape IDs in the order they are tried by RecuSolver
+        - Solver.tied_table[key] is the tuple of shape IDs sharing the minimum cost (see RandomGreedySolver)
+    Each of the 1024 patterns is laid out around a root in a scratch target and evaluated with the original methods...
+    ... so the set ordering, and hence tie-breaking, is identical to calling find_shapes at every root
+    Every outline_path element is part of the footprint, so lies inside the window: costs depend on the key alone
+    '''
+    greedy_table, costed_table, tied_table = [], [], []
+    for key in range(1 << len(Solver.position_eval_data)):
+        scratch = GreedySolver([[0] * 5 for r in range(3)])                 # Root at (2, 4) of the padded scratch target
+        scratch.T[2][4] = 1
+        for k, p in enumerate(Solver.position_eval_data):
+            scratch.T[2 + p[0][0]][4 + p[0][1]] = (key >> k) & 1
+        valid_set = scratch.find_shapes(2, 4)
+        greedy_table.append(scratch.find_min_cost_shape(2, 4, valid_set) if valid_set else None)
+        costed_table.append(tuple(cost_tuple[0] for cost_tuple in RecuSolver.find_costed_array(scratch, 2, 4, valid_set)))
+        costs = {shape_id: scratch.find_shape_cost(2, 4, shape_id) for shape_id in valid_set}
+        tied_table.append(tuple(shape_id for shape_id in costs if costs[shape_id] == min(costs.values())))
+    Solver.greedy_table, Solver.costed_table, Solver.tied_table = greedy_table, costed_table, tied_table
+
+
+build_window_tables()
+RecuSolver.cover_offsets = [        # Tiles of each shape, relative to each of its tiles in turn (see RecuSolver.is_coverable)
+    [(p[0] - q[0], p[1] - q[1]) for p in shape.footprint] for shape in Solver.shapes.values() for q in shape.footprint
+]
+Solver.footprint_ids = {        # Shape ID of each footprint, as sorted offsets from its first tile (the root, for every shape)
+    tuple(sorted(shape.footprint)): shape_id for shape_id, shape in Solver.shapes.items()
+}
+
+
+class BitboardSolver(Solver):
+    '''
+    Greedy solver backed by integer bitmasks (one Python int per row) instead of the padded list-of-lists target
+    Bit j of a row corresponds to column j of the padded target used by Solver, so every offset matches the list-based code
+        - self.T0 holds the 1s in the target, and self.A holds those which are not yet tiled (truthy elements of Solver.T)
+        - self.F holds elements which are already tiled, or are padding (None elements of Solver.T)
+    The 11 elements around a root are packed into a window integer (see window_bit), and all shape data is precomputed...
+    ... as masks in that window, so fit tests and costs are a handful of AND operations
+    Rows are processed 60 columns at a time (see chunk), so that the per-root operations act on small ints rather than entire rows
+    Decisions depend only on the window, so they are memoised in greedy_choices and force_fit_choices (shared by all instances)
+    Greedy choices come from Solver.greedy_table (see build_window_tables)
+    Speed-up over the original list-based GreedySolver (before the lookup tables) on 1000 x 1000 targets of density...
+    ... 0.5 - 0.7: 3.2 - 4.1x including the solution matrix, and 3.5 - 5.3x without it (see solve_pieces), so short of...
+    ... the 5x aimed for; over the table-driven GreedySolver it is about 1.6x (performance_std.py reports this)
+    '''
+    greedy_choices = {}
+    force_fit_choices = {}
+
+    def __init__(self, T, filled=None):
+        '''filled optionally marks (with 1s) elements already tiled by pieces outside this solver, e.g. either side of a seam'''
+        self.rows = len(T) + 4
+        self.cols = len(T[0]) + 4
+        full = (1 << self.cols) - 1                             # Padding rows are entirely 'filled'
+        edges = 0b11 | (0b11 << (self.cols - 2))                # Padding columns either side of each row
+        self.T0 = [0, 0] + [self.row_mask(r) for r in T] + [0, 0]
+        self.F = [full, full] + [edges for r in T] + [full, full]
+        if filled is not None:
+            for i, r in enumerate(filled, 2):
+                self.F[i] |= self.row_mask(r)
+                self.T0[i] &= ~self.F[i]
+        self.A = list(self.T0)
+        self.placements = []                                    # (shape_id, i, j) for each piece, in order of placement
+
+    @staticmethod
+    def row_mask(r):
+        '''Converts a row of the target (a list, or a NumPy array of 0s and 1s) into an integer, with the first element of the row at bit 2'''
+        if isinstance(r, np.ndarray):
+            return int.from_bytes(np.packbits(r, bitorder='little').tobytes(), 'little') << 2
+        return int(''.join(['1' if el else '0' for el in reversed(r)]) or '0', 2) << 2
+
+    @staticmethod
+    def window_bit(di, dj):
+        '''
+        Bit of the window integer holding the element at (di, dj) relative to the root
+        Bits 0 - 2: (0, 0) to (0, 2), bits 3 - 7: (1, -2) to (1, 2), bits 8 - 10: (2, -1) to (2, 1)
+        '''
+        return 1 << ((0, 5, 9)[di] + dj)
+
+    def solve(self):
+        self.solve_placements()
+        return self.build_solution()
+
+    def solve_placements(self):
+        '''Runs both passes, returning the (shape_id, i, j) placements (in the padded target) in order of placement'''
+        with self.phase('greedy'):
+            for i in range(2, self.rows - 2):               # Greedy pass (identical decisions to GreedySolver.solve)
+                self.greedy_row(i)
+        with self.phase('force_fit'):
+            for i in range(2, self.rows - 2):               # Greedy pass only tiles 1s, so tiled elements are 1s no longer in self.A
+                self.F[i] |= self.T0[i] & ~self.A[i]
+            for i in range(2, self.rows - 2):               # Force fit pass
+                self.force_fit_row(i)
+        return self.placements
+
+    def greedy_row(self, i):
+        '''Greedy pass over the roots in row i, reading rows i to i + 2 of self.A (self.F is not updated)'''
+        A, placements = self.A, self.placements
+        choices, chunk_masks = self.greedy_choices, self.chunk_masks
+        for c in range(2, self.cols - 2, 60):               # Roots are taken 60 columns at a time (see self.chunk)
+            if not (A[i] >> c) & 0xFFFFFFFFFFFFFFF:
+                continue
+            X = self.chunk(A, i, c)
+            k = 0
+            while True:                                     # Jump to each remaining 1 in the chunk
+                m = (X & 0xFFFFFFFFFFFFFFF) >> k
+                if not m:
+                    break
+                k += (m & -m).bit_length() - 1
+                w = (X >> k) & 0x7000000000000001F0000000000000007      # Window of the root at (i, c + k)
+                if w not in choices:                        # Memoised, to convert each window to a table key only once
+                    choices[w] = self.choose_greedy(self.table_key(self.compact(w)))
+                shape_id = choices[w]
+                if shape_id:                                # Inlined fit_shape (self.F is rebuilt after this pass)
+                    X &= ~(chunk_masks[shape_id] << k)
+                    placements.append((shape_id, i, c + k))
+                k += 1
+            self.unchunk(A, i, c, X)
+
+    def force_fit_row(self, i):
+        '''Force fit pass over the roots in row i, chunked in the same way as greedy_row with Y for self.F'''
+        A, F, placements = self.A, self.F, self.placements
+        choices, chunk_masks = self.force_fit_choices, self.chunk_masks
+        for c in range(2, self.cols - 2, 60):
+            if not (A[i] >> c) & 0xFFFFFFFFFFFFFFF:
+                continue
+            X = self.chunk(A, i, c)
+            Y = self.chunk(F, i, c)
+            k = 0
+            while True:
+                m = (X & 0xFFFFFFFFFFFFFFF) >> k
+                if not m:
+                    break
+                k += (m & -m).bit_length() - 1
+                key = (X >> k) & 0x7000000000000001F0000000000000007 | ((Y >> k) & 0x7000000000000001F0000000000000007) << 192
+                if key not in choices:
+                    choices[key] = self.find_force_fit_shape(self.compact(key), self.compact(key >> 192))
+                shape_id = choices[key]
+                if shape_id:
+                    X &= ~(chunk_masks[shape_id] << k)
+                    Y |= chunk_masks[shape_id] << k
+                    placements.append((shape_id, i, c + k))
+                k += 1
+            self.unchunk(A, i, c, X)
+            self.unchunk(F, i, c, Y)
+
+    @staticmethod
+    def chunk(M, i, c):
+        '''
+        Copies 64 bits from each of rows i, i + 1 and i + 2 of bitboard M into a single small int, 64 bits apart
+        Bit 0 holds column c of row i, bit 64 holds column c - 2 of row i + 1 and bit 128 holds column c - 1 of row i + 2...
+        ... so the window of the root at column c + k can be read with one shift and AND (see compact)
+        '''
+        return (((M[i] >> c) & 0xFFFFFFFFFFFFFFFF) | ((M[i + 1] >> (c - 2)) & 0xFFFFFFFFFFFFFFFF) << 64
+                | ((M[i + 2] >> (c - 1)) & 0xFFFFFFFFFFFFFFFF) << 128)
+
+    @staticmethod
+    def unchunk(M, i, c, X):
+        '''Writes a chunk (see chunk) back into rows i, i + 1 and i + 2 of bitboard M'''
+        M[i] = M[i] & ~(0xFFFFFFFFFFFFFFFF << c) | (X & 0xFFFFFFFFFFFFFFFF) << c
+        M[i + 1] = M[i + 1] & ~(0xFFFFFFFFFFFFFFFF << (c - 2)) | ((X >> 64) & 0xFFFFFFFFFFFFFFFF) << (c - 2)
+        M[i + 2] = M[i + 2] & ~(0xFFFFFFFFFFFFFFFF << (c - 1)) | ((X >> 128) & 0xFFFFFFFFFFFFFFFF) << (c - 1)
+
+    @staticmethod
+    def compact(x):
+        '''Converts a window read from a chunk into a window integer (see window_bit)'''
+        return (x & 7) | ((x >> 64) & 31) << 3 | ((x >> 128) & 7) << 8
+
+    def choose_greedy(self, key):
+        '''Returns the greedy choice of shape for a table key (see build_window_tables)'''
+        return self.greedy_table[key]
+
+    def table_key(self, w):
+        '''Converts a window integer into the equivalent key of Solver.find_window_key'''
+        key = 0
+        for k, (bit, shape_ids) in enumerate(self.eval_bits):
+            if w & bit:
+                key |= 1 << k
+        return key
+
+    def find_force_fit_shape(self, w, f):
+        '''Equivalent of GreedySolver.find_force_fit_shape, for the windows w of self.A and f of self.F'''
+        valid_set = {4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19}
+        for bit, shape_ids in self.eval_bits:
+            if f & bit:
+                valid_set = valid_set - shape_ids
+        for shape_id in valid_set:
+            if (w & self.footprint_bits[shape_id]).bit_count() == 3:
+                return shape_id
+        return None
+
+    def fit_shape(self, i, j, shape_id):
+        '''Clears the shape's footprint from self.A and sets it in self.F (the solution matrix is only built once solving is complete)'''
+        for di, mask in self.footprint_rows[shape_id]:
+            m = mask << (j - 2)
+            self.A[i + di] &= ~m
+            self.F[i + di] |= m
+        self.placements.append((shape_id, i, j))
+
+    def build_solution(self):
+        '''Writes the placements into an unpadded solution matrix of (shape_id, piece_id) tuples'''
+        return placements_to_solution(self.placements, self.rows - 4, self.cols - 4, pad=2)
+
+    def solve_pieces(self):
+        '''Solves the target, returning a PieceList (see Solver.solve_pieces), with pieces numbered in order of placement'''
+        return PieceList.from_placements(self.solve_placements(), self.rows - 4, self.cols - 4, pad=2)
+
+
+BitboardSolver.eval_bits = [(BitboardSolver.window_bit(*p[0]), p[1]) for p in Solver.position_eval_data]
+BitboardSolver.footprint_bits = {
+    shape_id: sum(BitboardSolver.window_bit(*p) for p in shape.footprint) for shape_id, shape in Solver.shapes.items()
+}
+BitboardSolver.footprint_rows = {                       # Row masks of each footprint, relative to the column 2 left of the root
+    shape_id: [(di, sum(1 << (p[1] + 2) for p in shape.footprint if p[0] == di)) for di in range(3)]
+    for shape_id, shape in Solver.shapes.items()
+}
+BitboardSolver.chunk_masks = {                         # Footprint masks relative to the root at bit 0 of a chunk (see BitboardSolver.chunk)
+    shape_id: rows[0][1] >> 2 | rows[1][1] << 64 | (rows[2][1] >> 1) << 128
+    for shape_id, rows in BitboardSolver.footprint_rows.items()
+}
+
+
+class StreamSolver(BitboardSolver):
+    '''
+    Greedy solver for targets too large to hold in memory, giving the same tiling as GreedySolver (via BitboardSolver)
+    Target rows are read one at a time from an iterable (e.g. a generator, or a numpy.memmap of shape (height, width))...
+    ... and each solution row is passed to sink as soon as it is finished, so only a rolling window of rows is ever held
+        - The greedy choice at a root in row i reads rows i to i + 2, so greedy_row(i) runs once row i + 2 has been read
+        - Force fitting at row i reads rows i to i + 2 after the greedy pass, so force_fit_row(i) runs 2 rows behind that
+        - Roots in later rows only place pieces in later rows, so row i is finished once it has been force fitted
+    Rows above the last finished row are dropped, so memory use is independent of the target height
+    Pieces are numbered in order of placement, so the piece IDs (but not the tiling) differ from GreedySolver's
+    '''
+    def __init__(self, rows, width, sink=None):
+        '''sink is called with each solution row (a list of (shape_id, piece_id) tuples), in order, if given'''
+        self.source = iter(rows)
+        self.width = width
+        self.cols = width + 4
+        self.sink = sink
+        self.edges = 0b11 | (0b11 << (self.cols - 2))
+        self.T0, self.A, self.F = [0, 0], [0, 0], [(1 << self.cols) - 1] * 2
+        self.S = [None, None]                                   # Solution rows held (None for the padding rows)
+        self.top = 0                                            # Padded index of the first row held
+        self.placements = []                                    # Placements not yet written into self.S
+        self.placed = None                                      # Unpadded placements written, if recorded (see solve_pieces)
+        self.piece_id = 0
+
+    def solve(self):
+        '''Solves the target, returning the solution matrix, or None if the rows were passed to sink instead'''
+        solution = []
+        emit = self.sink or solution.append
+        greedy = finished = 2                                   # Padded indices of the next rows to solve greedily and to force fit
+        last = 1                                                # Padded index of the last row read
+        for r in self.source:
+            self.add_row(self.row_mask(r), self.edges)
+            last += 1
+            while greedy <= last - 2:
+                greedy = self.greedy_step(greedy)
+            while finished <= greedy - 3:
+                finished = self.force_fit_step(finished, emit)
+        for k in range(2):                                      # Bottom padding rows
+            self.add_row(0, (1 << self.cols) - 1)
+        while greedy <= last:
+            greedy = self.greedy_step(greedy)
+        while finished <= last:
+            finished = self.force_fit_step(finished, emit)
+        return None if self.sink else solution
+
+    def solve_pieces(self):
+        '''
+        Solves the target, returning a PieceList (see Solver.solve_pieces), with pieces numbered in order of placement
+        Placements are recorded as they are written, and solution rows are only counted (and passed to sink, if given)...
+        ... so the PieceList is the only part of the solution held
+        '''
+        sink, height = self.sink, 0
+
+        def count(row):
+            nonlocal height
+            height += 1
+            if sink:
+                sink(row)
+
+        self.sink, self.placed = count, []
+        try:
+            self.solve()
+            return PieceList.from_placements(self.placed, height, self.width)
+        finally:
+            self.sink, self.placed = sink, None
+
+    def add_row(self, mask, filled):
+        self.T0.append(mask)
+        self.A.append(mask)
+        self.F.append(filled)
+        self.S.append([(0, 0)] * self.width)
+
+    def greedy_step(self, i):
+        '''Runs the greedy pass over row i (a padded index), and returns the next row'''
+        k = i - self.top
+        self.greedy_row(k)
+        self.F[k] |= self.T0[k] & ~self.A[k]                    # Row i is no longer changed by the greedy pass (see BitboardSolver.solve)
+        self.write_placements()
+        return i + 1
+
+    def force_fit_step(self, i, emit):
+        '''Runs the force fit pass over row i (a padded index), emits the finished row, and returns the next row'''
+        self.force_fit_row(i - self.top)
+        self.write_placements()
+        for M in (self.T0, self.A, self.F, self.S):             # Rows above row i are never read again
+            del M[:i - self.top]
+        self.top = i
+        emit(self.S[0])
+        return i + 1
+
+    def write_placements(self):
+        '''Numbers the new placements, and writes them into the solution rows held'''
+        for shape_id, i, j in self.placements:
+            self.piece_id += 1
+            for di, dj in self.shapes[shape_id].footprint:
+                self.S[i + di][j + dj - 2] = (shape_id, self.piece_id)
+        if self.placed is not None:
+            self.placed.extend((shape_id, i + self.top - 2, j - 2) for shape_id, i, j in self.placements)
+        self.placements.clear()
+
+
+class RandomGreedySolver(BitboardSolver):
+    '''
+    BitboardSolver which breaks ties between minimum cost shapes at random (see Solver.tied_table), rather than by...
+    ... the set iteration order of GreedySolver.find_min_cost_shape
+    Each window pattern's tie is broken once per solver, so choices are memoised per instance, and the random...
+    ... policy (and so the solution) is reproducible from seed
+    '''
+    def __init__(self, T, seed=0, filled=None):
+        super().__init__(T, filled)
+        self.random = random.Random(seed)
+        self.greedy_choices = {}
+
+    def choose_greedy(self, key):
+        tied = self.tied_table[key]
+        return self.random.choice(tied) if tied else None
+
+
+class VectorGreedySolver(Solver):
+    '''
+    Greedy solver which evaluates many roots at once with NumPy, giving the same solution as GreedySolver
+    The padded target is held as flat uint8 arrays: self.A (1s not yet tiled) and self.F (tiled elements and padding)
+    The decision at root (i, j) reads and writes elements up to 2 rows below and 2 columns either side of it, so it can only...
+    ... be affected by earlier roots up to 2 rows above and 4 columns to the right (see position_eval_data)
+    With t = j + skew * i and skew = 5, every such root has a smaller t, so all roots with equal t are independent and...
+    ... sweeping t upwards visits them in an order equivalent to the top - bottom, left - right scan of GreedySolver
+    Piece IDs are assigned after the sweeps in root order, so they also match GreedySolver
+    '''
+    skew = 5
+    force_fit_table = None                              # Built on first use (see build_force_fit_table)
+
+    def __init__(self, T):
+        T = np.asarray(T, dtype=np.uint8)
+        self.rows, self.cols = T.shape[0] + 4, T.shape[1] + 4
+        A = np.zeros((self.rows, self.cols), dtype=np.uint8)
+        A[2:-2, 2:-2] = T
+        F = np.ones((self.rows, self.cols), dtype=np.uint8)
+        F[2:-2, 2:-2] = 0
+        self.A, self.F = A.ravel(), F.ravel()
+        self.eval_offsets = np.array([p[0][0] * self.cols + p[0][1] for p in self.position_eval_data])
+        self.footprint_offsets = np.zeros((20, 4), dtype=np.int64)     # Indexed by shape ID (rows 0 - 3 are unused)
+        for shape_id, shape in self.shapes.items():
+            self.footprint_offsets[shape_id] = [p[0] * self.cols + p[1] for p in shape.footprint]
+        if VectorGreedySolver.force_fit_table is None:
+            VectorGreedySolver.build_force_fit_table()
+
+    def solve(self):
+        shapes, pieces = self.solve_arrays()
+        return [list(zip(s, p)) for s, p in zip(shapes.tolist(), pieces.tolist())]
+
+    def solve_arrays(self):
+        '''Solves the target, returning the solution as separate (unpadded) arrays of shape IDs and piece IDs'''
+        return self.solve_pieces().arrays()
+
+    def solve_pieces(self):
+        '''Solves the target, returning a PieceList (see Solver.solve_pieces)'''
+        greedy_table = np.array([shape_id or 0 for shape_id in self.greedy_table], dtype=np.int8)
+        greedy = self.sweep(lambda keys: greedy_table[keys(self.A)])
+        force_fit = self.sweep(lambda keys: self.force_fit_table[keys(self.F) << 10 | keys(self.A)])
+        roots = np.concatenate([greedy[0], force_fit[0]])   # All greedy pieces are numbered before the force fitted pieces
+        rows, cols = np.divmod(roots, self.cols)
+        return PieceList(np.concatenate([greedy[1], force_fit[1]]), rows - 2, cols - 2, self.rows - 4, self.cols - 4)
+
+    def sweep(self, choose):
+        '''
+        Visits every remaining 1 in self.A, one skewed diagonal at a time, and fits the shape returned by choose...
+        ... which is given the diagonal's roots (via a function that packs their windows, as in Solver.find_window_key)
+        Returns the roots and shape IDs of the fitted pieces, sorted into top - bottom, left - right order
+        '''
+        pow2 = 1 << np.arange(len(self.position_eval_data))
+        base = np.arange(self.rows) * (self.cols - self.skew)      # Flat index of (i, t - skew * i) is t + base[i]
+        placed_roots, placed_shapes = [], []
+        for t in range(2 + 2 * self.skew, self.cols - 3 + (self.rows - 3) * self.skew + 1):
+            lo = max(2, -(-(t - self.cols + 3) // self.skew))     # Rows for which column t - skew * i is inside the target
+            hi = min(self.rows - 3, (t - 2) // self.skew)
+            roots = base[lo:hi + 1] + t
+            roots = roots[self.A[roots] == 1]
+            if not roots.size:
+                continue
+            shape_ids = choose(lambda M: M[roots[:, None] + self.eval_offsets] @ pow2)
+            roots, shape_ids = roots[shape_ids > 0], shape_ids[shape_ids > 0]
+            cells = (roots[:, None] + self.footprint_offsets[shape_ids]).ravel()
+            self.A[cells] = 0
+            self.F[cells] = 1
+            placed_roots.append(roots)
+            placed_shapes.append(shape_ids)
+        if not placed_roots:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int8)
+        roots, shape_ids = np.concatenate(placed_roots), np.concatenate(placed_shapes)
+        order = np.argsort(roots)
+        return roots[order], shape_ids[order]
+
+    @classmethod
+    def build_force_fit_table(cls):
+        '''
+        Builds force_fit_table, the equivalent of GreedySolver.find_force_fit_shape indexed by (f << 10 | a), where...
+        ... f and a pack the already tiled (None) and untiled 1 elements of the window (as in Solver.find_window_key)
+        Shapes are ranked in the iteration order of the valid_set built in find_force_fit_shape, so the first...
+        ... shape with 3 out of 4 tiles on 1s is the same one
+        '''
+        n = len(cls.position_eval_data)
+        window_bits = np.zeros(20, dtype=np.int64)     # Window positions covered by each shape (the root is always a 1)
+        for k, p in enumerate(cls.position_eval_data):
+            for shape_id in cls.shapes:
+                if p[0] in cls.shapes[shape_id].footprint:
+                    window_bits[shape_id] |= 1 << k
+        popcount = np.array([bin(x).count('1') for x in range(1 << n)])
+        scores = popcount[np.arange(1 << n)[:, None] & window_bits[None, :]] + 1
+        table = np.zeros((1 << n, 1 << n), dtype=np.int8)
+        for f in range(1 << n):
+            valid_set = {4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19}
+            for k, p in enumerate(cls.position_eval_data):
+                if f >> k & 1:
+                    valid_set = valid_set - p[1]
+            rank = np.full(20, 99)
+            rank[list(valid_set)] = np.arange(len(valid_set))
+            ranked = np.where(scores == 3, rank[None, :], 99)
+            table[f] = np.where(ranked.min(axis=1) < 99, ranked.argmin(axis=1), 0)
+        cls.force_fit_table = table.ravel()
+
+
+def placements_to_solution(placements, height, width, pad=0):
+    '''
+    Writes a list of (shape_id, i, j) placements into a solution matrix of (shape_id, piece_id) tuples
+    Pieces are numbered in list order, and pad is subtracted from each root position (2 if taken from a padded target)
+    '''
+    S = [(0, 0)] * (width * height)                     # Flat matrix, split into rows once all pieces are written
+    offsets = {shape_id: [p[0] * width + p[1] for p in shape.footprint] for shape_id, shape in Solver.shapes.items()}
+    for piece_id, (shape_id, i, j) in enumerate(placements, 1):
+        el = (shape_id, piece_id)
+        base = (i - pad) * width + j - pad
+        o0, o1, o2, o3 = offsets[shape_id]
+        S[base + o0] = S[base + o1] = S[base + o2] = S[base + o3] = el
+    return [S[r:r + width] for r in range(0, len(S), width)]
+
+
+class PieceList:
+    '''
+    Compact solution: the shape ID and root (its first tile, top - bottom, left - right) of each piece, in typed arrays
+        - shape_ids (int8), rows and cols (int32), with piece k (from 0) having piece ID k + 1, so 9 bytes per piece...
+          ... rather than a (shape_id, piece_id) tuple for every element of the target
+        - Reads as the solution matrix it stands for: len gives its height, and indexing or iterating expands only the...
+          ... rows asked for, from the pieces rooted up to tallest rows above each (found by binary search)
+    arrays expands the whole matrix into (shapes, pieces) arrays at once, and utils.check_solution validates the pieces...
+    ... directly, without expanding them at all
+    '''
+    tallest = 2                 # Rows below its root reached by the tallest shape
+
+    def __init__(self, shape_ids, rows, cols, height, width):
+        self.shape_ids = np.asarray(shape_ids, dtype=np.int8)
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.cols = np.asarray(cols, dtype=np.int32)
+        self.height, self.width = height, width
+        self.by_row = None                              # Piece indices in root row order, built on first row access
+
+    @classmethod
+    def from_placements(cls, placements, height, width, pad=0):
+        '''Packs (shape_id, i, j) placements into a PieceList, numbering pieces in list order (as placements_to_solution)'''
+        P = np.array(placements, dtype=np.int32).reshape(-1, 3)
+        return cls(P[:, 0], P[:, 1] - pad, P[:, 2] - pad, height, width)
+
+    @classmethod
+    def from_solution(cls, S):
+        '''Packs a solution matrix (or a (shapes, pieces) pair of arrays) into a PieceList, keeping the pieces' ID order'''
+        shapes, pieces = (np.asarray(a) for a in (S if isinstance(S, tuple) else solution_arrays(S)))
+        ids, first = np.unique(pieces.ravel(), return_index=True)      # The first element of each piece is its root
+        first = first[ids > 0]
+        rows, cols = np.divmod(first, pieces.shape[1])
+        return cls(shapes.ravel()[first], rows, cols, *pieces.shape)
+
+    def __len__(self):
+        return self.height
+
+    def __iter__(self):
+        return (self[i] for i in range(self.height))
+
+    def __getitem__(self, i):
+        '''Expands row i of the solution matrix'''
+        if i < 0:
+            i += self.height
+        if not 0 <= i < self.height:
+            raise IndexError('solution row out of range')
+        if self.by_row is None:
+            self.by_row = np.argsort(self.rows, kind='stable')
+            self.sorted_rows = self.rows[self.by_row]
+        lo, hi = np.searchsorted(self.sorted_rows, [i - self.tallest, i + 1]).tolist()
+        k = self.by_row[lo:hi]
+        row = [(0, 0)] * self.width
+        for piece, shape_id, r, c in zip(k.tolist(), self.shape_ids[k].tolist(), self.rows[k].tolist(), self.cols[k].tolist()):
+            for dj in self.row_offsets[shape_id][i - r]:
+                row[c + dj] = (shape_id, piece + 1)
+        return row
+
+    def arrays(self):
+        '''Expands the pieces into (shapes, pieces) arrays of int8 shape IDs and int32 piece IDs (as solution_arrays)'''
+        shapes = np.zeros(self.height * self.width, dtype=np.int8)
+        pieces = np.zeros(self.height * self.width, dtype=np.int32)
+        cells = ((self.rows[:, None] + self.footprint_rows[self.shape_ids]) * self.width
+                 + self.cols[:, None] + self.footprint_cols[self.shape_ids])
+        shapes[cells] = self.shape_ids[:, None]
+        pieces[cells] = np.arange(1, self.shape_ids.size + 1, dtype=np.int32)[:, None]
+        return shapes.reshape(self.height, self.width), pieces.reshape(self.height, self.width)
+
+    def placements(self):
+        '''Returns the pieces as a list of (shape_id, i, j) placements, in piece ID order'''
+        return list(zip(self.shape_ids.tolist(), self.rows.tolist(), self.cols.tolist()))
+
+
+PieceList.row_offsets = {       # Columns of each shape's tiles (relative to its root), in each row below its root
+    shape_id: [[p[1] for p in shape.footprint if p[0] == di] for di in range(PieceList.tallest + 1)]
+    for shape_id, shape in Solver.shapes.items()
+}
+PieceList.footprint_rows, PieceList.footprint_cols = np.array([       # Indexed by shape ID (rows 0 - 3 are unused)
+    list(zip(*Solver.shapes[shape_id].footprint)) if shape_id in Solver.shapes else [[0] * 4] * 2 for shape_id in range(20)
+], dtype=np.int32).transpose(1, 0, 2)
+
+
+def label_regions(T):
+    '''
+    Labels the (4-connected) regions of 1s in the target with NumPy operations over whole arrays, rather than a flood fill
+        - Each row is split into runs of 1s, and runs are joined wherever a 1 has a 1 directly below it
+        - The joins are merged by union-find, applied to every join at once: each pair's roots are hooked together...
+          ... (the larger onto the smaller), and the trees flattened, until no join links two different roots
+    Returns (cells, starts): the flat indices (i * width + j) of the 1s grouped by region, with region k at...
+    ... cells[starts[k]:starts[k + 1]], regions in order of their first element and elements top - bottom, left - right
+    '''
+    A = np.asarray(T, dtype=bool)
+    width = A.shape[1]
+    cells = np.flatnonzero(A)
+    first = A.copy()                                    # First element of each run
+    first[:, 1:] &= ~A[:, :-1]
+    run = np.cumsum(first.ravel()[cells]) - 1           # Run of each 1, numbered top - bottom, left - right
+    run_at = np.zeros(A.size, dtype=np.int64)
+    run_at[cells] = run
+    below = np.flatnonzero(A[:-1] & A[1:])              # 1s with a 1 below
+    joins = np.unique(run_at[below] * max(run.size, 1) + run_at[below + width])
+    a, b = np.divmod(joins, max(run.size, 1))
+    root = np.arange(run.size)
+    while True:
+        ra, rb = root[a], root[b]
+        linked = ra != rb
+        if not linked.any():
+            break
+        np.minimum.at(root, np.maximum(ra, rb)[linked], np.minimum(ra, rb)[linked])
+        while True:
+            up = root[root]
+            if np.array_equal(up, root):
+                break
+            root = up
+    label = root[run]                                   # The first run of each region, so labels are in region order
+    order = np.argsort(label, kind='stable')
+    label = label[order]
+    starts = np.flatnonzero(np.diff(label, prepend=-1))
+    return cells[order], np.append(starts, cells.size)
+
+
+def find_regions(T):
+    '''Returns the (4-connected) regions of 1s in the target, each as a list of (i, j) positions in top - bottom, left - right order'''
+    cells, starts = label_regions(T)
+    rows, cols = np.divmod(cells, len(T[0]))
+    positions = list(zip(rows.tolist(), cols.tolist()))
+    return [positions[s:e] for s, e in zip(starts.tolist(), starts[1:].tolist())]
+
+
+def solve_band(T, filled=None):
+    '''Worker function for BandSolver: greedily solves a band (or seam region), returning its unpadded placements'''
+    solver = BitboardSolver(T, filled)
+    solver.solve()
+    return [(shape_id, i - 2, j - 2) for shape_id, i, j in solver.placements]
+
+
+class BandSolver(Solver):
+    '''
+    Parallel greedy solver: the target is split into horizontal bands, which are solved in separate processes
+    Greedy decisions look at most 2 rows below the root, so bands are almost independent, and only the rows...
+    ... around each boundary (the seam) are affected by the split
+    Seam repair: pieces within self.margin rows of a boundary are removed, and the freed region is re-solved greedily...
+    ... with pieces allowed to cross the boundary, keeping the result only if it reduces missing + excess in the region
+    Pieces are renumbered in top - bottom, left - right order of their roots once the bands are merged
+    filled optionally marks (with 1s) elements already tiled by pieces from another solver (see BitboardSolver)
+    '''
+    min_band_rows = 16
+
+    def __init__(self, T, workers=None, margin=2, filled=None):
+        self.T = as_lists(T)
+        self.height, self.width = len(T), len(T[0])
+        self.workers = workers or os.cpu_count()
+        self.margin = margin
+        self.filled = filled
+
+    def solve(self):
+        placements = self.solve_placements()
+        placements.sort(key=lambda p: (p[1], p[2]))
+        return placements_to_solution(placements, self.height, self.width)
+
+    def solve_placements(self):
+        '''Solves the target, returning the (shape_id, i, j) placements of the merged bands'''
+        n_bands = max(1, min(self.workers, self.height // self.min_band_rows))
+        bounds = [self.height * k // n_bands for k in range(n_bands + 1)]
+        if n_bands == 1:
+            return solve_band(self.T, self.filled)
+        filled = [self.filled and self.filled[r0:r1] for r0, r1 in zip(bounds, bounds[1:])]
+        with ProcessPoolExecutor(min(self.workers, n_bands)) as pool:
+            bands = pool.map(solve_band, [self.T[r0:r1] for r0, r1 in zip(bounds, bounds[1:])], filled)
+            placements = [(shape_id, i + r0, j) for r0, band in zip(bounds, bands) for shape_id, i, j in band]
+            return self.repair_seams(pool, placements, bounds[1:-1])
+
+    def repair_seams(self, pool, placements, seams):
+        '''
+        Re-solves the region around each seam in parallel (regions are disjoint as bands are at least min_band_rows tall)
+        Region rows run from seam - margin - 2 to seam + margin + 2, which contains every cell of the removed pieces
+        '''
+        by_row = {}                                     # Placements indexed by root row
+        for p in placements:
+            by_row.setdefault(p[1], []).append(p)
+        regions, removed, args = [], set(), []
+        for b in seams:
+            r0, r1 = max(0, b - self.margin - 2), min(self.height, b + self.margin + 2)
+            old, filled = [], [self.filled[i][:] if self.filled else [0] * self.width for i in range(r0, r1)]
+            for i in range(r0 - 2, r1):
+                for p in by_row.get(i, []):
+                    if b - self.margin - self.shape_rows[p[0]] < i < b + self.margin:   # Piece overlaps the seam rows
+                        old.append(p)
+                        continue
+                    for q in self.shapes[p[0]].footprint:                               # Otherwise it is kept...
+                        if r0 <= i + q[0] < r1:                                         # ... so its cells are filled
+                            filled[i + q[0] - r0][p[2] + q[1]] = 1
+            regions.append((r0, old))
+            removed.update(old)
+            args.append(([r[:] for r in self.T[r0:r1]], filled))
+        repaired = pool.map(solve_band, *zip(*args))
+        kept = [p for p in placements if p not in removed]
+        for (r0, old), (T, filled), new in zip(regions, args, repaired):
+            new = [(shape_id, i + r0, j) for shape_id, i, j in new]
+            kept += new if self.region_error(T, filled, new, r0) < self.region_error(T, filled, old, r0) else old
+        return kept
+
+    def region_error(self, T, F, placements, r0):
+        '''Counts missing + excess elements in a region (rows r0 onwards), given the region's filled elements F'''
+        covered = [r[:] for r in F]
+        for shape_id, i, j in placements:
+            for p in self.shapes[shape_id].footprint:
+                covered[i + p[0] - r0][j + p[1]] = 1
+        return sum(t != c for rt, rc in zip(T, covered) for t, c in zip(rt, rc))
+
+
+class ExactSolver(Solver):
+    '''
+    Perfect tiling solver, treating the problem as exact cover and searching it with Dancing Links (Knuth's Algorithm X)
+        - Each 1 in the target is a column, which must be covered exactly once
+        - Each placement of a shape with all 4 tiles on 1s is a row, covering those 4 columns
+    Nodes are held in flat lists (self.L, self.R, self.U, self.D, self.C), so covering and uncovering are O(1) per node
+    The search always branches on the column (target element) with the fewest remaining placements, and is iterative...
+    ... so it is not limited by the recursion depth
+    Each connected region of 1s is searched separately, so a dead end in one region never backtracks through another
+    Three things keep large regions tractable:
+        - After each placement, any pocket of uncovered elements it closes off is checked, and then solved before anything else
+        - Dead ends backjump straight to the most recent placement responsible for them (conflict-directed backjumping)...
+          ... rather than retrying every unrelated placement made since
+        - The search is restarted with a shuffled shape order whenever a node limit is hit, and the limit grows each time...
+          ... so an unlucky early choice cannot trap it, and it still finishes (proving no tiling exists) eventually
+    An empty solution is returned if the target has no perfect tiling
+    node_budget optionally bounds the search nodes spent on each region (over all restarts), after which the region is...
+    ... given up as if it had no tiling, and counted in self.abandoned
+    '''
+    pocket_size = 200           # Pockets of uncovered elements up to this size are found after each placement
+    first_node_limit = 1        # Node limit per element for the first attempt at each region, growing 1.5x per restart
+
+    def __init__(self, T, seed=0, node_budget=None):
+        self.T = as_lists(T)
+        self.height, self.width = len(T), len(T[0])
+        self.random = random.Random(seed)   # Restarts are seeded, so the solution is reproducible
+        self.node_budget = node_budget
+        self.abandoned = 0
+
+    def solve(self):
+        placements = self.solve_placements()
+        placements.sort(key=lambda p: (p[1], p[2]))
+        return placements_to_solution(placements, self.height, self.width)
+
+    def solve_placements(self):
+        '''Returns the (shape_id, i, j) placements perfectly tiling the target, or no placements if that is impossible'''
+        placements = []
+        with self.phase('regions'):
+            regions = find_regions(self.T)
+        for region in regions:
+            if len(region) % 4:                         # Regions must be a multiple of 4 elements to be tiled perfectly
+                return []
+            with self.phase('search'):
+                found = self.solve_region(region)
+            if found is None:
+                return []
+            placements += found
+        return placements
+
+    def solve_region(self, region):
+        '''
+        Returns the (shape_id, i, j) placements tiling the region, or None if it cannot be tiled (within node_budget)
+        Regions in the tiling library are looked up rather than searched (its best tiling is perfect, or none exists)
+        '''
+        found = tiling_library.lookup(region)
+        if found is not None:
+            if self.stats:
+                self.stats.counts['library'] = self.stats.counts.get('library', 0) + 1
+            return found if 4 * len(found) == len(region) else None
+        shape_ids = list(self.shapes)
+        limit = self.first_node_limit * len(region)
+        spent = 0
+        while True:
+            if self.node_budget:
+                if spent >= self.node_budget:
+                    self.abandoned += 1
+                    return None
+                limit = min(limit, self.node_budget - spent)
+            self.build(region, shape_ids)
+            found = self.search(limit)
+            spent += self.nodes
+            if self.stats:
+                self.stats.progress(self.stats.nodes + self.nodes, 0, len(self.stack))
+                self.stats.counts['restarts'] = self.stats.counts.get('restarts', 0) + (found is None)
+            if found:
+                return [self.rows[(r - self.base) >> 2] for r in self.stack]
+            if found is not None:                       # Search finished within the limit, so no tiling exists
+                return None
+            self.random.shuffle(shape_ids)
+            limit = int(limit * 1.5)
+
+    def build(self, cells, shape_ids):
+        '''Sets up the nodes for the exact cover problem of tiling the given target elements'''
+        self.columns = {cell: c for c, cell in enumerate(cells, 1)}    # Column index of each target element
+        n = len(self.columns)
+        self.L, self.R = [n] + list(range(n)), list(range(1, n + 1)) + [0]    # Node 0 is the root of the column headers
+        self.U, self.D, self.C = list(range(n + 1)), list(range(n + 1)), list(range(n + 1))
+        self.size = [0] * (n + 1)
+        self.base = n + 1                               # First row node: row k is made of nodes base + 4k to base + 4k + 3
+        self.free = [True] * (n + 1)                    # Whether each column is still uncovered
+        self.covered_by = [0] * (n + 1)                 # Level of the placement covering each column (if covered)
+        self.adjacent = [[]] + [
+            [self.columns[q] for q in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1)) if q in self.columns]
+            for (i, j) in cells
+        ]
+        self.col_rows = [[] for c in range(n + 1)]      # Every row of each column, whether or not it has been removed
+        self.rows = []                                  # (shape_id, i, j) of the placement made by each row
+        for (i, j) in cells:
+            for shape_id in shape_ids:
+                row = [self.columns.get((i + p[0], j + p[1])) for p in self.shapes[shape_id].footprint]
+                if all(row):
+                    self.add_row(row, (shape_id, i, j))
+        self.removed_by = [0] * len(self.rows)          # Level which removed each row (if removed)
+
+    def add_row(self, cells, placement):
+        '''Appends a row of 4 nodes (one per column in cells) to the bottom of each column'''
+        first = len(self.C)
+        for k, c in enumerate(cells):
+            node = first + k
+            self.L.append(first + (k - 1) % 4)
+            self.R.append(first + (k + 1) % 4)
+            self.U.append(self.U[c])
+            self.D.append(c)
+            self.D[self.U[c]] = node
+            self.U[c] = node
+            self.C.append(c)
+            self.size[c] += 1
+            self.col_rows[c].append(len(self.rows))
+        self.rows.append(placement)
+
+    def cover(self, c, level):
+        L, R, U, D, C, size = self.L, self.R, self.U, self.D, self.C, self.size
+        L[R[c]], R[L[c]] = L[c], R[c]
+        i = D[c]
+        while i != c:
+            self.removed_by[(i - self.base) >> 2] = level
+            j = R[i]
+            while j != i:
+                U[D[j]], D[U[j]] = U[j], D[j]
+                size[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(self, c):
+        L, R, U, D, C, size = self.L, self.R, self.U, self.D, self.C, self.size
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                size[C[j]] += 1
+                U[D[j]] = D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        L[R[c]] = R[L[c]] = c
+
+    def select(self, r, level):
+        '''Places row r (whose own column is already covered), covering its other columns'''
+        j = self.R[r]
+        while j != r:
+            self.cover(self.C[j], level)
+            j = self.R[j]
+        first = r - ((r - self.base) & 3)
+        for c in self.C[first:first + 4]:
+            self.free[c] = False
+            self.covered_by[c] = level
+
+    def unselect(self, r):
+        '''Removes row r, undoing select'''
+        j = self.L[r]
+        while j != r:
+            self.uncover(self.C[j])
+            j = self.L[j]
+        first = r - ((r - self.base) & 3)
+        for c in self.C[first:first + 4]:
+            self.free[c] = True
+
+    def find_pockets(self, r):
+        '''
+        Finds the uncovered elements next to row r's placement (which must already be marked covered)...
+        ... and returns the closed pockets (of up to self.pocket_size elements) they lie in, as lists of columns
+        '''
+        free, adjacent = self.free, self.adjacent
+        row = [r]
+        j = self.R[r]
+        while j != r:
+            row.append(j)
+            j = self.R[j]
+        checked, pockets = set(), []
+        for node in row:
+            for start in adjacent[self.C[node]]:
+                if not free[start] or start in checked:
+                    continue
+                pocket, frontier = {start}, [start]     # Flood fill from start, giving up once it exceeds pocket_size
+                while frontier and len(pocket) <= self.pocket_size:
+                    for c in adjacent[frontier.pop()]:
+                        if free[c] and c not in pocket:
+                            pocket.add(c)
+                            frontier.append(c)
+                checked |= pocket
+                if not frontier:
+                    pockets.append(sorted(pocket))
+        return pockets
+
+    def search(self, node_limit):
+        '''
+        Iterative Algorithm X with conflict-directed backjumping
+        self.stack holds the row node chosen at each level, and is a solution when True is returned
+        Returns False if there is no solution, or None if node_limit was reached first
+        Each level keeps a conflict set: the earlier levels whose placements ruled out some of its options
+        A dead end's conflict set is made of the levels which removed its column's rows (see removed_by), or which...
+        ... covered the border of a pocket that is not a multiple of 4 elements (see covered_by)
+        The search then jumps back to the latest level in the conflict set, as nothing placed after it could have helped
+        Closed pockets (see find_pockets) are solved before anything else, most recently found first
+        '''
+        R, D, size, free = self.R, self.D, self.size, self.free
+        adjacent, covered_by, removed_by, col_rows = self.adjacent, self.covered_by, self.removed_by, self.col_rows
+        self.stack = []
+        self.nodes = 0
+        cols, conflicts, focus_at = [], [], []          # Column, conflict set and focus of each level
+        focus = None                                    # Pockets to solve first, as a linked list of (columns, next)
+        dead_end = None                                 # Conflict set of the latest dead end, while backjumping
+        while True:
+            if dead_end is None:
+                if R[0] == 0:                           # Every column is covered
+                    return True
+                self.nodes += 1
+                if self.nodes > node_limit:
+                    return None
+                while focus and not any(free[c] for c in focus[0]):
+                    focus = focus[1]
+                if focus:                               # Pick the column with the fewest rows, within the pocket
+                    c = None
+                    for j in focus[0]:
+                        if free[j] and (c is None or size[j] < size[c]):
+                            c = j
+                            if size[c] < 2:
+                                break
+                else:                                   # Or anywhere
+                    c, j = R[0], R[R[0]]
+                    while j != 0 and size[c] > 1:
+                        if size[j] < size[c]:
+                            c = j
+                        j = R[j]
+                level = len(cols)
+                self.cover(c, level)
+                cols.append(c)
+                conflicts.append(set())
+                focus_at.append(focus)
+                r = D[c]
+            else:
+                if not dead_end:                        # Nothing placed is to blame, so there is no solution
+                    return False
+                level = max(dead_end)
+                while len(cols) > level + 1:            # Undo every level after the one to blame
+                    self.unselect(self.stack.pop())
+                    self.uncover(cols.pop())
+                    conflicts.pop()
+                    focus_at.pop()
+                dead_end.discard(level)
+                conflicts[level] |= dead_end
+                dead_end = None
+                r = self.stack.pop()
+                self.unselect(r)
+                c, focus = cols[level], focus_at[level]
+                r = D[r]
+            while r != c:                               # Try each remaining row in the column
+                self.select(r, level)
+                pockets = self.find_pockets(r)
+                odd = [p for p in pockets if len(p) % 4]
+                if not odd:
+                    break
+                conflicts[level] |= {covered_by[b] for p in odd for x in p for b in adjacent[x] if not free[b]}
+                conflicts[level].discard(level)
+                self.unselect(r)
+                r = D[r]
+            if r == c:                                  # No rows left in this column, backjump
+                dead_end = conflicts.pop() | {removed_by[x] for x in col_rows[c] if removed_by[x] < level}
+                self.uncover(cols.pop())
+                focus_at.pop()
+                continue
+            self.stack.append(r)
+            for pocket in pockets:
+                focus = (pocket, focus)
+
+
+def solve_exact_region(T, node_budget=None):
+    '''
+    Worker function for RegionSolver: returns the placements perfectly tiling the (cropped) region T, or None if...
+    ... that is impossible, or no tiling is found within node_budget search nodes
+    '''
+    return ExactSolver(T, node_budget=node_budget).solve_region([(i, j) for i, r in enumerate(T) for j, el in enumerate(r) if el])
+
+
+class TilingLibrary:
+    '''
+    Precomputed optimal tilings of every connected region of up to max_size elements, looked up by the region's shape
+        - Each region is reduced to a canonical form: the smallest (sorted) cell tuple over its 8 rotations / reflections...
+          ... translated to start at (0, 0), so regions of the same shape share one entry wherever they are in the target
+        - An entry holds the most pieces that fit in the region with no excess (a perfect tiling, if there is one)...
+          ... as (shape_id, i, j) placements in the canonical frame, mapped back onto the region on lookup
+        - Entries are keyed by an 8 byte hash of the canonical form, sorted, so a lookup is a binary search
+    File layout (little-endian): magic, then max_size, count and 0 as u4 (see write_header), count u8 keys...
+    ... count + 1 u4 offsets into the placements, then the placements as int8 (shape_id, i, j) triples
+    The file is memory-mapped on first use, so processes share it, and a missing file is an empty library (max_size 0)
+    The library is built offline (see build), as enumerating every region is far slower than solving any one of them
+    '''
+    magic = b'TLIB'
+    default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tilings.tlib')
+    transforms = [(1, 0, 0, 1), (0, 1, -1, 0), (-1, 0, 0, -1), (0, -1, 1, 0),   # (a, b, c, d) maps (i, j) to...
+                  (1, 0, 0, -1), (0, 1, 1, 0), (-1, 0, 0, 1), (0, -1, -1, 0)]   # ... (a.i + b.j, c.i + d.j)
+
+    def __init__(self, path=None):
+        self.path = path or self.default_path
+        self.keys = None                    # Loaded on first use (see load)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            self.size, self.keys, self.offsets, self.placements = 0, np.zeros(0, '<u8'), np.zeros(1, '<u4'), None
+            return
+        self.size, n = read_header(self.path, self.magic)      # The header has the same layout as a target file's
+        self.keys = np.memmap(self.path, dtype='<u8', mode='r', offset=16, shape=(n,))
+        self.offsets = np.memmap(self.path, dtype='<u4', mode='r', offset=16 + 8 * n, shape=(n + 1,))
+        self.placements = np.memmap(self.path, dtype=np.int8, mode='r', offset=20 + 12 * n, shape=(int(self.offsets[-1]), 3))
+
+    @property
+    def max_size(self):
+        if self.keys is None:
+            self.load()
+        return self.size
+
+    @classmethod
+    def canonical(cls, cells):
+        '''Returns (form, transform, shift): the canonical form of the cells, and how the cells were mapped onto it'''
+        best = None
+        for a, b, c, d in cls.transforms:
+            moved = [(a * i + b * j, c * i + d * j) for i, j in cells]
+            i0, j0 = min(p[0] for p in moved), min(p[1] for p in moved)
+            form = tuple(sorted((i - i0, j - j0) for i, j in moved))
+            if best is None or form < best[0]:
+                best = (form, (a, b, c, d), (i0, j0))
+        return best
+
+    @staticmethod
+    def hash_key(form):
+        return int.from_bytes(hashlib.blake2b(bytes(x for cell in form for x in cell), digest_size=8).digest(), 'little')
+
+    def lookup(self, cells):
+        '''
+        Returns the (shape_id, i, j) placements of the best tiling of the region (a list of (i, j) positions)...
+        ... or None if the region is not in the library
+        '''
+        if not 0 < len(cells) <= self.max_size:
+            return None
+        form, (a, b, c, d), (i0, j0) = self.canonical(cells)
+        key = self.hash_key(form)
+        n = int(np.searchsorted(self.keys, key))
+        if n == len(self.keys) or int(self.keys[n]) != key:
+            return None
+        region, placements = set(cells), []
+        for shape_id, i, j in self.placements[self.offsets[n]:self.offsets[n + 1]].tolist():
+            moved = [(i + p[0] + i0, j + p[1] + j0) for p in Solver.shapes[shape_id].footprint]
+            moved = sorted((a * u + c * v, b * u + d * v) for u, v in moved)      # The inverse of a transform is its transpose
+            offsets = tuple((u - moved[0][0], v - moved[0][1]) for u, v in moved)
+            if not region.issuperset(moved):            # Hash collision, so the entry is for another region
+                return None
+            placements.append((Solver.footprint_ids[offsets], moved[0][0], moved[0][1]))
+        return placements
+
+    @classmethod
+    def build(cls, path=None, max_size=12):
+        '''
+        Writes the library of every connected region of 4 to max_size elements (the number of regions grows about...
+        ... 4 times with each element: max_size 12, as shipped, has about 87000 regions and takes under a minute)
+        Regions are grown one element at a time from the canonical regions one element smaller, and each is solved...
+        ... exactly by best_packing
+        '''
+        forms, entries = {((0, 0),)}, {}
+        for size in range(2, max_size + 1):
+            grown = set()
+            for form in forms:
+                cells = set(form)
+                for i, j in form:
+                    for q in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1)):
+                        if q not in cells:
+                            grown.add(cls.canonical(form + (q,))[0])
+            forms = grown
+            if size >= 4:
+                for form in forms:
+                    entries[cls.hash_key(form)] = cls.best_packing(form)
+        keys = sorted(entries)
+        offsets = np.cumsum([0] + [len(entries[k]) for k in keys])
+        path = path or cls.default_path
+        write_header(path, cls.magic, max_size, len(keys))
+        with open(path, 'ab') as f:
+            f.write(np.array(keys, dtype='<u8').tobytes())
+            f.write(offsets.astype('<u4').tobytes())
+            f.write(np.array([p for k in keys for p in entries[k]], dtype=np.int8).tobytes())
+
+    @staticmethod
+    def best_packing(form):
+        '''
+        Returns the most (shape_id, i, j) placements that fit in the region with no excess, by a memoised search...
+        ... in which the first remaining element (top - bottom, left - right) is either covered by a piece, or left
+        '''
+        index = {cell: n for n, cell in enumerate(form)}
+        options = [[] for cell in form]                 # (mask, placement) of each piece rooted at each element
+        for n, (i, j) in enumerate(form):
+            for shape_id, shape in Solver.shapes.items():
+                cells = [(i + p[0], j + p[1]) for p in shape.footprint]
+                if all(c in index for c in cells):
+                    options[n].append((sum(1 << index[c] for c in cells), (shape_id, i, j)))
+        memo = {0: (0, None)}
+
+        def search(mask):
+            '''Returns (pieces, choices) for the remaining elements, with choices a linked list of (placement, rest)'''
+            if mask in memo:
+                return memo[mask]
+            n = (mask & -mask).bit_length() - 1
+            best = search(mask & ~(1 << n))
+            for option_mask, placement in options[n]:
+                if option_mask & mask == option_mask:
+                    pieces, rest = search(mask & ~option_mask)
+                    if pieces + 1 > best[0]:
+                        best = (pieces + 1, (placement, rest))
+            memo[mask] = best
+            return best
+
+        choices, placements = search((1 << len(form)) - 1)[1], []
+        while choices:
+            placements.append(choices[0])
+            choices = choices[1]
+        return placements
+
+
+tiling_library = TilingLibrary()        # Loaded on first lookup
+
+
+class RegionSolver(Solver):
+    '''
+    Splits the target into its connected regions of 1s (see label_regions), and solves each with the best solver for its size
+        - Regions small enough for the tiling library are tiled perfectly by lookup (see TilingLibrary), or left to the...
+          ... greedy pass if the library shows they have no perfect tiling
+        - Other regions of up to exact_size elements (and a multiple of 4) are tiled perfectly with ExactSolver, across...
+          ... worker processes if there are several, each within a budget of region_nodes search nodes per element
+        - Larger regions, small regions with no perfect tiling (or none found within budget), and any regions not yet...
+          ... reached once time_limit seconds have been spent (labelling aside), are solved greedily in a single pass over the target...
+          ... with the perfectly tiled regions marked as filled (via BitboardSolver, or BandSolver given several workers)
+        - Regions whose size is not a multiple of 4 are never searched, and a target with no regions to search is...
+          ... solved greedily straight away
+    Every shape that fits at a root lies within the root's region, so each region is solved greedily just as it would be alone
+    Decomposing costs up to a few times a greedy solve, for a small gain in accuracy, so Tetris only uses RegionSolver...
+    ... for targets of up to max_cells elements (where that is a few milliseconds), or when it is given improve_time
+    improve_time optionally spends up to that many seconds improving the merged solution (see LocalSearch)
+    Pieces are numbered in top - bottom, left - right order of their roots once the regions are merged
+    filled optionally marks (with 1s) elements already tiled by other pieces, which must be 0s in T (see TetrisSession)...
+    ... and is not supported by LocalSearch, so improve_time is ignored if it is given
+    '''
+    region_nodes = 20           # Search nodes per element allowed for each region, after which it is solved greedily
+    max_cells = 40000           # Largest target (in elements) Tetris decomposes by default
+
+    def __init__(self, T, workers=None, exact_size=100, improve_time=None, filled=None, time_limit=None):
+        self.A = np.asarray(T, dtype=np.uint8)
+        self.T = as_lists(T)
+        self.height, self.width = len(T), len(T[0])
+        self.workers = workers
+        self.exact_size = exact_size
+        self.improve_time = improve_time
+        self.filled = filled
+        self.time_limit = time_limit
+
+    def solve(self):
+        placements = self.solve_placements()
+        placements.sort(key=lambda p: (p[1], p[2]))
+        return placements_to_solution(placements, self.height, self.width)
+
+    def solve_placements(self):
+        '''Solves the target, returning unsorted (shape_id, i, j) placements'''
+        deadline = self.time_limit and time.perf_counter() + self.time_limit
+        placements, crops, origins, regions = [], [], [], []
+        library = 0
+        with self.phase('regions'):
+            cells, starts = label_regions(self.A)
+            sizes = np.diff(starts)
+            chosen = np.flatnonzero((sizes >= 4) & (sizes <= self.exact_size) & (sizes % 4 == 0)).tolist()
+            rows, cols = (a.tolist() for a in np.divmod(cells, self.width))
+            for k in chosen:
+                if deadline and time.perf_counter() > deadline:     # Out of time, so the rest are left for the greedy pass
+                    break
+                s, e = int(starts[k]), int(starts[k + 1])
+                region = list(zip(rows[s:e], cols[s:e]))
+                tiling = tiling_library.lookup(region)
+                if tiling is not None:
+                    library += 1
+                    if 4 * len(tiling) == len(region):  # Otherwise there is no perfect tiling, and it is left for the greedy pass
+                        placements += tiling
+                        regions.append((s, e))
+                    continue
+                i0, j0 = region[0][0], min(cols[s:e])
+                crop = [[0] * (max(cols[s:e]) - j0 + 1) for r in range(region[-1][0] - i0 + 1)]
+                for i, j in region:
+                    crop[i - i0][j - j0] = 1
+                crops.append(crop)
+                origins.append((i0, j0, s, e))
+        with self.phase('exact'):
+            tilings = self.solve_exact(crops, deadline)
+        for (i0, j0, s, e), tiling in zip(origins, tilings):
+            if tiling is not None:                      # Otherwise it is left for the greedy pass
+                placements += [(shape_id, i + i0, j + j0) for shape_id, i, j in tiling]
+                regions.append((s, e))
+        if self.stats:
+            self.stats.counts.update(exact_regions=len(crops), exact_tiled=sum(t is not None for t in tilings),
+                                     library_regions=library)
+        if sum(e - s for s, e in regions) == cells.size:
+            return placements
+        filled = None                                   # Elements tiled by the pieces so far (and by self.filled)
+        if regions or self.filled is not None:
+            filled = np.zeros(self.height * self.width, dtype=np.uint8)
+            for s, e in regions:
+                filled[cells[s:e]] = 1
+            filled = filled.reshape(self.height, self.width)
+            if self.filled is not None:
+                filled |= np.asarray(self.filled, dtype=np.uint8)
+        with self.phase('greedy'):
+            if self.workers and self.workers > 1:
+                placements += BandSolver(self.T, self.workers, filled=None if filled is None else filled.tolist()).solve_placements()
+            else:
+                placements += solve_band(self.A, filled)
+        if self.improve_time and self.filled is None:
+            with self.phase('improve'):
+                placements = LocalSearch(self.T, placements, self.improve_time).improve()
+        return placements
+
+    def solve_exact(self, crops, deadline):
+        '''
+        Tiles each cropped region with ExactSolver (within its node budget), returning its placements, or None for each...
+        ... region with no perfect tiling, none found within budget, or not reached by the deadline
+        '''
+        budgets = [self.region_nodes * sum(map(sum, crop)) for crop in crops]
+        tilings = [None] * len(crops)
+        if self.workers and self.workers > 1 and len(crops) > 1:
+            with ProcessPoolExecutor(self.workers) as pool:
+                results = pool.map(solve_exact_region, crops, budgets, chunksize=max(1, len(crops) // (4 * self.workers)))
+                try:
+                    for k, tiling in enumerate(results):
+                        tilings[k] = tiling
+                        if deadline and time.perf_counter() > deadline:
+                            break
+                finally:
+                    pool.shutdown(cancel_futures=True)  # Chunks not started are dropped, the rest finish within budget
+            return tilings
+        for k, (crop, budget) in enumerate(zip(crops, budgets)):
+            if deadline and time.perf_counter() > deadline:
+                break
+            tilings[k] = solve_exact_region(crop, budget)
+        return tilings
+
+
+class LocalSearch:
+    '''
+    Improves a solution (as (shape_id, i, j) placements) by large neighbourhood search, within a time limit
+        - Windows of window x window elements are ranked by their number of missing and excess elements
+        - Only windows holding an error element are ranked, from a set of error elements kept up to date as pieces change
+        - In each window, the pieces touching it are removed, and the freed elements are re-tiled optimally (see best_tiling)
+        - The new pieces are kept only if they reduce the number of missing + excess elements
+    Windows are revisited (in rank order) until a full sweep makes no improvement, or time runs out
+    '''
+    node_limit = 20000          # Re-tiling of a window is abandoned once this many states have been searched
+
+    def __init__(self, T, placements, time_limit=1.0, window=4):
+        self.T = as_lists(T)
+        self.height, self.width = len(T), len(T[0])
+        self.time_limit = time_limit
+        self.window = window
+        self.pieces = dict(enumerate(placements))       # Pieces by index, with the index of the piece covering each element
+        self.owner = [[None] * self.width for r in range(self.height)]
+        covered = np.zeros((self.height, self.width), dtype=bool)
+        for k, p in self.pieces.items():
+            for i, j in self.cells(p):
+                self.owner[i][j] = k
+                covered[i, j] = True
+        self.errors = set(map(tuple, np.argwhere(covered != np.asarray(T, dtype=bool)).tolist()))  # Missing and excess elements
+        self.next_key = len(placements)
+
+    def cells(self, placement):
+        shape_id, i, j = placement
+        return [(i + p[0], j + p[1]) for p in Solver.shapes[shape_id].footprint]
+
+    def error(self, i, j):
+        '''Whether the element at (i, j) is missing or excess'''
+        return bool(self.T[i][j]) != (self.owner[i][j] is not None)
+
+    def improve(self):
+        '''Runs the search, returning the improved placements'''
+        deadline = time.perf_counter() + self.time_limit
+        improved = True
+        while improved:
+            improved = False
+            windows = self.rank_windows(deadline)
+            for errors, i0, j0 in windows:
+                if time.perf_counter() > deadline:
+                    return list(self.pieces.values())
+                improved |= self.improve_window(i0, j0)
+        return list(self.pieces.values())
+
+    def rank_windows(self, deadline):
+        '''
+        Returns the windows with more than 1 error element, as (-errors, i0, j0) sorted most errors first
+        Each error element is counted in the windows covering it; an empty list is returned once the deadline passes
+        '''
+        step = max(1, self.window // 2)
+        last_i0 = (max(1, self.height - self.window + step) - 1) // step * step
+        last_j0 = (max(1, self.width - self.window + step) - 1) // step * step
+        counts = {}
+        for n, (i, j) in enumerate(self.errors):
+            if not n & 1023 and time.perf_counter() > deadline:
+                return []
+            for i0 in range(max(0, -(-(i - self.window + 1) // step)) * step, min(i // step * step, last_i0) + 1, step):
+                for j0 in range(max(0, -(-(j - self.window + 1) // step)) * step, min(j // step * step, last_j0) + 1, step):
+                    counts[i0, j0] = counts.get((i0, j0), 0) + 1
+        return sorted((-errors, i0, j0) for (i0, j0), errors in counts.items() if errors > 1)
+
+    def improve_window(self, i0, j0):
+        '''Re-tiles the elements freed by removing the pieces touching a window, returning True if the result is better'''
+        i1, j1 = min(i0 + self.window, self.height), min(j0 + self.window, self.width)
+        removed = {self.owner[i][j] for i in range(i0, i1) for j in range(j0, j1)} - {None}
+        area = {(i, j) for i in range(i0, i1) for j in range(j0, j1) if self.owner[i][j] is None}
+        for k in removed:
+            area.update(self.cells(self.pieces[k]))
+        before = sum(self.error(i, j) for i, j in area)
+        cost, tiling = self.best_tiling(sorted(area), before)
+        if tiling is None or cost >= before:
+            return False
+        for k in removed:
+            for i, j in self.cells(self.pieces.pop(k)):
+                self.owner[i][j] = None
+        for p in tiling:
+            self.pieces[self.next_key] = p
+            for i, j in self.cells(p):
+                self.owner[i][j] = self.next_key
+            self.next_key += 1
+        for i, j in area:
+            if self.error(i, j):
+                self.errors.add((i, j))
+            else:
+                self.errors.discard((i, j))
+        return True
+
+    def best_tiling(self, area, bound):
+        '''
+        Finds the placements within the area (a sorted list of free elements) with the fewest missing + excess elements
+        Each 1 in turn (top - bottom, left - right) is either covered by a piece, or left missing, with the area held as...
+        ... a bitmask of elements that are covered or left missing; the best cost of each state is memoised
+        Returns (cost, placements), or (bound, None) if nothing better than bound is found within node_limit states
+        '''
+        index = {cell: n for n, cell in enumerate(area)}
+        ones = [n for n, (i, j) in enumerate(area) if self.T[i][j]]
+        options = [[] for n in area]                    # (mask, excess, placement) of each piece covering each element
+        for i, j in area:
+            for shape_id, shape in Solver.shapes.items():
+                cells = [(i + p[0], j + p[1]) for p in shape.footprint]
+                if all(c in index for c in cells):
+                    mask = sum(1 << index[c] for c in cells)
+                    excess = sum(not self.T[c[0]][c[1]] for c in cells)
+                    if excess > 1:                      # A piece with 2 or more excess elements never reduces the cost
+                        continue
+                    for c in cells:
+                        options[index[c]].append((mask, excess, (shape_id, i, j)))
+        low = [0] * (len(ones) + 1)                     # Elements below low[k] are untouched by the pieces of ones[k:]
+        low[-1] = len(area)
+        for k in range(len(ones) - 1, -1, -1):
+            low[k] = min([low[k + 1]] + [(m & -m).bit_length() - 1 for m, excess, placement in options[ones[k]]])
+        memo = {}
+
+        def search(k, mask):
+            '''Returns (cost, choices) for the rest of the area, with choices a linked list of (placement or None, rest)'''
+            while k < len(ones) and mask >> ones[k] & 1:
+                k += 1
+            if k == len(ones):
+                return 0, None
+            key = (k, mask >> low[k])
+            if key in memo:
+                return memo[key]
+            if len(memo) > self.node_limit:
+                raise TimeoutError
+            n = ones[k]
+            cost, rest = search(k + 1, mask | 1 << n)   # Leave the element missing...
+            best = (cost + 1, (None, rest))
+            for option_mask, excess, placement in options[n]:
+                if not option_mask & mask:              # ... or cover it with any piece that fits
+                    cost, rest = search(k + 1, mask | option_mask)
+                    if cost + excess < best[0]:
+                        best = (cost + excess, (placement, rest))
+            memo[key] = best
+            return best
+
+        try:
+            cost, choices = search(0, 0)
+        except TimeoutError:
+            return bound, None
+        tiling = []
+        while choices:
+            if choices[0]:
+                tiling.append(choices[0])
+            choices = choices[1]
+        return cost, tiling
+
+
+BandSolver.shape_rows = {shape_id: max(p[0] for p in shape.footprint) + 1 for shape_id, shape in Solver.shapes.items()}
+
+
+class BeamSolver(Solver):
+    '''
+    Scans roots in the same order as GreedySolver, but keeps the beam_width best partial tilings rather than just one
+        - At each remaining 1, every partial tiling is extended by each shape that fits there (minimum cost first, see...
+          ... Solver.costed_table), and by leaving the element uncovered
+        - Partial tilings are ranked by the number of 1s passed without being covered, plus a lookahead penalty: the free...
+          ... 1s next to each new piece that no shape can cover any more (which are remembered, so never counted twice)
+        - Partial tilings with identical state ahead of the scan are merged, keeping the best
+    Each partial tiling only holds the state ahead of the scan, as bitmasks relative to the current root (bit k is the...
+    ... element k places after it in the padded target, as in BitboardSolver): the elements already tiled, and those...
+    ... found uncoverable. Its pieces are a linked list shared with the partial tiling it was extended from, so no grid...
+    ... is ever copied
+    Elements left uncovered are then force fitted (via BitboardSolver, with the beam's pieces marked as filled)
+    Even beam_width=1 differs from GreedySolver, as leaving an element uncovered competes with the shapes that fit there
+    '''
+    def __init__(self, T, beam_width=8):
+        self.T = as_lists(T)
+        self.height, self.width = len(T), len(T[0])
+        self.beam_width = beam_width
+        c = self.cols = self.width + 4
+        self.target_rows = [BitboardSolver.row_mask(r) for r in self.T] + [0] * 5
+        self.shape_masks = {
+            shape_id: sum(1 << (p[0] * c + p[1]) for p in shape.footprint) for shape_id, shape in self.shapes.items()
+        }
+        self.eval_deltas = [p[0][0] * c + p[0][1] for p in self.position_eval_data]
+        self.cover_masks = []                           # (first delta, mask from it) of each shape, relative to each of its tiles
+        for offsets in RecuSolver.cover_offsets:
+            deltas = [p[0] * c + p[1] for p in offsets]
+            self.cover_masks.append((min(deltas), sum(1 << (d - min(deltas)) for d in deltas)))
+        self.neighbours = {                             # Elements next to each shape, after the root and within its rows
+            shape_id: sorted(n for n in {(p[0] + a) * c + p[1] + b for p in shape.footprint for a, b in ((0, 1), (0, -1), (1, 0))
+                                         if p[0] + a <= 2} - {p[0] * c + p[1] for p in shape.footprint} if n > 0)
+            for shape_id, shape in self.shapes.items()
+        }
+
+    def solve(self):
+        placements = self.solve_placements()
+        placements.sort(key=lambda p: (p[1], p[2]))
+        return placements_to_solution(placements, self.height, self.width)
+
+    def solve_placements(self):
+        beam = [(0, 0, 0, None)]                        # (score, tiled, uncoverable, pieces) of each partial tiling
+        position = 0                                    # Padded flat index the beam's bitmasks are relative to
+        for i in range(self.height):
+            rows = self.target_rows[i:i + 5]
+            window = rows[0] | rows[1] << self.cols | rows[2] << 2 * self.cols | rows[3] << 3 * self.cols | rows[4] << 4 * self.cols
+            m = rows[0]
+            while m:
+                j = (m & -m).bit_length() - 1
+                m &= m - 1
+                shift = i * self.cols + j - position
+                position += shift
+                beam = self.step([(score, tiled >> shift, dead >> shift, pieces) for score, tiled, dead, pieces in beam],
+                                 window >> j, position)
+        placements = []
+        pieces = beam[0][3]
+        while pieces:
+            (shape_id, root), pieces = pieces
+            placements.append((shape_id, root // self.cols, root % self.cols - 2))
+        filled = [[0] * self.width for r in range(self.height)]
+        for shape_id, i, j in placements:
+            for p in self.shapes[shape_id].footprint:
+                filled[i + p[0]][j + p[1]] = 1
+        rest = BitboardSolver(self.T, filled).solve_placements()      # Force fit what the beam left uncovered
+        return placements + [(shape_id, i - 2, j - 2) for shape_id, i, j in rest]
+
+    def step(self, beam, window, position):
+        '''Extends each partial tiling at the root at position (window holds the target's 1s from there on)'''
+        candidates = []
+        for score, tiled, dead, pieces in beam:
+            free = window & ~tiled
+            if not free & 1 or dead & 1:                # Already tiled, or already counted as uncoverable
+                candidates.append((score, tiled, dead, pieces))
+                continue
+            key = 0
+            for k, d in enumerate(self.eval_deltas):
+                if free >> d & 1:
+                    key |= 1 << k
+            for shape_id in self.costed_table[key]:
+                mask = self.shape_masks[shape_id]
+                rest = free & ~mask
+                new_dead = 0
+                for n in self.neighbours[shape_id]:
+                    if rest >> n & 1 and not dead >> n & 1 and not self.is_coverable(rest, n):
+                        new_dead |= 1 << n
+                candidates.append((score + new_dead.bit_count(), tiled | mask, dead | new_dead, ((shape_id, position), pieces)))
+            candidates.append((score + 1, tiled, dead, pieces))     # Leave the root uncovered
+        candidates.sort(key=lambda candidate: candidate[0])        # Stable, so ties keep the minimum cost shape first
+        beam, seen = [], set()
+        for candidate in candidates:
+            if (candidate[1], candidate[2]) not in seen:
+                seen.add((candidate[1], candidate[2]))
+                beam.append(candidate)
+                if len(beam) == self.beam_width:
+                    break
+        return beam
+
+    def is_coverable(self, free, n):
+        '''Returns whether any shape fits over the free element n places after the root (see RecuSolver.is_coverable)'''
+        for first, mask in self.cover_masks:
+            if n + first >= 0 and (free >> (n + first)) & mask == mask:
+                return True
+        return False
+
+
+variant_target = None           # Target of the MultiStartSolver in this process (see set_variant_target)
+
+
+def set_variant_target(T):
+    '''Worker initialiser for MultiStartSolver, so the target is sent to each worker process only once'''
+    global variant_target
+    variant_target = np.asarray(T, dtype=np.uint8)
+
+
+def solve_variant(variant, seed):
+    '''
+    Worker function for MultiStartSolver: solves one variant of variant_target greedily
+    Variant v is solved on one of the 8 rotations / reflections of the target (v % 8), so the scan order is effectively...
+    ... bottom - top, right - left, column by column etc., with random tie-breaking (RandomGreedySolver) from v >= 8
+    Returns (missing + excess, placements), with the placements mapped back onto the original target
+    '''
+    T = variant_target
+    index = np.arange(T.size).reshape(T.shape)          # Original flat index of each element, transformed with the target
+    if variant % 8 >= 4:
+        T, index = T[:, ::-1], index[:, ::-1]
+    T, index = np.ascontiguousarray(np.rot90(T, variant % 4)), np.rot90(index, variant % 4)
+    solver = RandomGreedySolver(T, seed) if variant >= 8 else BitboardSolver(T)
+    width = variant_target.shape[1]
+    placements, covered = [], np.zeros(T.size, dtype=bool)
+    for shape_id, i, j in solver.solve_placements():
+        cells = sorted(divmod(int(index[i - 2 + p[0], j - 2 + p[1]]), width) for p in Solver.shapes[shape_id].footprint)
+        (i0, j0), offsets = cells[0], tuple((a - cells[0][0], b - cells[0][1]) for a, b in cells)
+        placements.append((Solver.footprint_ids[offsets], i0, j0))   # The root is the first tile, top - bottom, left - right
+        covered[[a * width + b for a, b in cells]] = True
+    ones = variant_target.ravel().astype(bool)
+    return int(np.count_nonzero(ones != covered)), placements
+
+
+class MultiStartSolver(Solver):
+    '''
+    Solves many variants of the greedy approach, across worker processes, and keeps the one with the fewest missing...
+    ... plus excess elements (see solve_variant for the variants: 8 orientations, then random tie-breaking)
+        - starts variants are solved (16 by default, or as many as time_limit allows if it is given)
+        - Solving stops early once a perfect tiling is found, and every variant before it has finished
+        - Variant v has seed random.Random(seed + v), and ties between equally good variants go to the first, so the...
+          ... result is reproducible from seed (with time_limit, it is the best of the variants finished in time)
+    Variant 0 is GreedySolver's own solution, so the result is never worse than it
+    The worker pool is terminated as soon as solving stops, so variants still running never outlast time_limit
+    '''
+    def __init__(self, T, workers=None, starts=None, time_limit=None, seed=0):
+        self.T = as_lists(T)
+        self.height, self.width = len(T), len(T[0])
+        self.workers = workers
+        self.starts = starts or (None if time_limit else 16)
+        self.time_limit = time_limit
+        self.seed = seed
+        self.errors = {}                                # Missing + excess elements of each variant solved
+
+    def solve(self):
+        placements = self.solve_placements()
+        placements.sort(key=lambda p: (p[1], p[2]))
+        return placements_to_solution(placements, self.height, self.width)
+
+    def solve_placements(self):
+        deadline = self.time_limit and time.perf_counter() + self.time_limit
+        variants = ((v, random.Random(self.seed + v).getrandbits(32)) for v in (range(self.starts) if self.starts else count()))
+        best = None
+        if not self.workers or self.workers == 1:
+            set_variant_target(self.T)
+            for v, seed in variants:
+                if deadline and time.perf_counter() > deadline and best:
+                    break
+                best = self.record(best, v, solve_variant(v, seed))
+                if best[0] == 0:
+                    break
+            return best[2]
+        pool = Pool(self.workers, initializer=set_variant_target, initargs=(self.T,))
+        finished = queue.SimpleQueue()                  # (variant, result, error) of each variant, as it finishes
+        pending = set()
+        try:
+            while True:
+                while len(pending) < 2 * self.workers and not (deadline and best and time.perf_counter() > deadline):
+                    item = next(variants, None)
+                    if item is None:
+                        break
+                    pool.apply_async(solve_variant, item, callback=lambda result, v=item[0]: finished.put((v, result, None)),
+                                     error_callback=lambda error, v=item[0]: finished.put((v, None, error)))
+                    pending.add(item[0])
+                if not pending:
+                    break
+                timeout = deadline and max(0, deadline - time.perf_counter()) if best else None
+                try:
+                    v, result, error = finished.get(timeout=timeout)
+                except queue.Empty:                     # Out of time
+                    break
+                if error:
+                    raise error
+                pending.remove(v)
+                best = self.record(best, v, result)
+                if best[0] == 0 and all(u > best[1] for u in pending):
+                    break
+        finally:
+            pool.terminate()                            # Stops the variants still running (unlike an executor's shutdown)...
+            pool.join()                                 # ... and waits for the worker processes to exit
+        return best[2]
+
+    def record(self, best, v, result):
+        '''Records a variant's result, returning the best (error, variant, placements) so far'''
+        self.errors[v] = result[0]
+        if best is None or (result[0], v) < best[:2]:
+            return (result[0], v, result[1])
+        return best
+
+
+def solve_in_process(conn, solver):
+    '''Worker process for PortfolioSolver: sends back the solver's PieceList (the process exits without sending if it fails)'''
+    conn.send(solver.solve_pieces())
+    conn.close()
+
+
+class PortfolioSolver(Solver):
+    '''
+    Races the greedy approach against an exact solver, in separate processes, within a deadline (in seconds)
+        - Cheap features of the target (see find_features) decide first whether the race can pay off: a target with a...
+          ... region that is not a multiple of 4 elements has no perfect tiling, and one with more 1s than exact_rate...
+          ... allows in the deadline is too hard, so both are solved greedily (with RegionSolver) straight away
+        - Targets whose regions are all in the tiling library are solved exactly in this process, as that is just lookups
+        - Otherwise RegionSolver and the exact solver (RecuSolver for targets of up to recursive_size elements, or...
+          ... ExactSolver) are started together, each in its own process, while this process solves the target in a...
+          ... single greedy pass (BitboardSolver) as a fallback
+        - A perfect tiling wins straight away; otherwise every process still running is stopped at the deadline, and...
+          ... whichever solution arrived with the fewest missing + excess elements wins (ties go to RegionSolver's)
+    The deadline bounds the whole solve: RegionSolver is given the time left as its time_limit, and the only work not...
+    ... bounded by it is the greedy fallback, so solve returns by the deadline or the end of a single greedy pass
+    Losing processes are terminated as soon as the winner is known, and joined, so no process outlives solve
+    The solver used is recorded in self.winner ('greedy', 'fallback' or 'exact'), and the features in self.features
+    '''
+    exact_rate = 1e-4           # Least time ExactSolver takes per 1 in the target (in seconds)
+    recursive_size = 100        # Targets up to this many elements are searched with RecuSolver (as by Tetris)
+    preference = ('greedy', 'fallback', 'exact')        # Order of the winner among solutions with equal error
+
+    def __init__(self, T, deadline):
+        self.T = as_lists(T)
+        self.height, self.width = len(T), len(T[0])
+        self.deadline = deadline
+        self.features = self.winner = None
+
+    def solve(self):
+        return list(self.solve_pieces())
+
+    def solve_pieces(self):
+        self.end = time.perf_counter() + self.deadline
+        f = self.features = self.find_features()
+        small = self.height * self.width <= self.recursive_size
+        if not small and (f['odd_regions'] or self.exact_rate * f['ones'] > self.deadline):
+            self.winner = 'greedy'
+            return RegionSolver(self.T, time_limit=self.time_left()).solve_pieces()
+        if not small and f['largest'] <= tiling_library.max_size:
+            P = ExactSolver(self.T).solve_pieces()
+            if self.find_error(P) == 0:
+                self.winner = 'exact'
+                return P
+            self.winner = 'greedy'
+            return RegionSolver(self.T, time_limit=self.time_left()).solve_pieces()
+        exact = RecuSolver(self.T, 0.9 * self.deadline) if small else ExactSolver(self.T)   # Time left to send back a partial tiling
+        with self.phase('race'):
+            results = self.race({'greedy': RegionSolver(self.T, time_limit=self.time_left()), 'exact': exact},
+                                fallback=BitboardSolver(self.T))
+        errors = {name: self.find_error(P) for name, P in results.items() if P is not None}
+        self.winner = min(errors, key=lambda name: (errors[name], self.preference.index(name)))
+        return results[self.winner]
+
+    def time_left(self):
+        return max(0, self.end - time.perf_counter())
+
+    def race(self, solvers, fallback=None):
+        '''
+        Runs each solver in its own process, returning {name: PieceList} for those that finished (None if one failed)...
+        ... stopping as soon as one is perfect, or at the deadline, when every process still running is terminated
+        fallback, if given, is solved in this process while the others run, under the name 'fallback', so there is...
+        ... a solution to return whatever the processes do
+        '''
+        processes, results = {}, {}
+        try:
+            for name, solver in solvers.items():
+                receiver, sender = Pipe(duplex=False)
+                process = Process(target=solve_in_process, args=(sender, solver), daemon=True)
+                process.start()
+                sender.close()                          # So recv raises EOFError if the process dies without sending
+                processes[receiver] = (name, process)
+            if fallback is not None:
+                results['fallback'] = fallback.solve_pieces()
+            while processes and not any(P is not None and self.find_error(P) == 0 for P in results.values()):
+                ready = wait_ready(list(processes), self.time_left())
+                if not ready:                           # Out of time, so the processes still running lose
+                    break
+                for conn in ready:
+                    name, process = processes.pop(conn)
+                    try:
+                        results[name] = conn.recv()
+                    except EOFError:
+                        results[name] = None
+                    self.stop(conn, process)
+        finally:
+            for conn, (name, process) in processes.items():
+                self.stop(conn, process)
+        return results
+
+    @staticmethod
+    def stop(conn, process):
+        '''Terminates a worker process (if it is still running), and waits for it to exit'''
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        conn.close()
+
+    def find_features(self):
+        '''Returns cheap features of the target: the number and density of its 1s, and the sizes of its connected regions'''
+        cells, starts = label_regions(self.T)
+        sizes = np.diff(starts)
+        ones = int(cells.size)
+        return {'ones': ones, 'density': ones / (self.height * self.width), 'regions': int(sizes.size),
+                'largest': int(sizes.max(initial=0)), 'odd_regions': int(np.count_nonzero(sizes % 4))}
+
+    def find_error(self, P):
+        '''Counts the missing + excess elements of a PieceList'''
+        shapes, pieces = P.arrays()
+        return int(np.count_nonzero((pieces > 0) != np.asarray(self.T, dtype=bool)))
+
+
+class TetrisSession:
+    '''
+    Keeps a target and its solution between edits to the target, re-solving only around the edited elements
+        - The target is solved in full once, with Tetris, and each piece's placement is kept by piece ID
+        - edit removes the pieces touching any element within margin of an edited element, groups the freed elements into...
+          ... connected clusters, and re-solves the bounding box of each cluster in turn with RegionSolver (so small freed...
+          ... regions are tiled perfectly, the rest greedily), with every piece kept marked as filled, so new pieces never...
+          ... overlap them
+    The cost of an edit depends on the size of the edit, not the size of the target
+    Pieces kept keep their IDs, and new pieces take IDs above any used before, so piece IDs are unique but not contiguous
+    '''
+    margin = 2                  # Pieces touching elements up to this many rows / columns from an edited element are re-solved
+
+    def __init__(self, T, exact_size=100, **options):
+        '''options are passed on to Tetris for the first solve (e.g. workers)'''
+        self.T = [list(r) for r in as_lists(T)]
+        self.height, self.width = len(self.T), len(self.T[0])
+        self.exact_size = exact_size
+        self.S = Tetris(self.T, **options)
+        self.pieces = {}                                # Piece ID: (shape_id, i, j)
+        for i, row in enumerate(self.S):
+            for j, (shape_id, piece_id) in enumerate(row):
+                if piece_id and piece_id not in self.pieces:    # The root is the first tile of each piece, top - bottom, left - right
+                    self.pieces[piece_id] = (shape_id, i, j)
+        self.next_id = max(self.pieces, default=0) + 1
+
+    def cells(self, placement):
+        shape_id, i, j = placement
+        return [(i + p[0], j + p[1]) for p in Solver.shapes[shape_id].footprint]
+
+    @staticmethod
+    def clusters(dirty):
+        '''Splits a set of (i, j) elements into lists of elements connected horizontally, vertically or diagonally'''
+        dirty = set(dirty)
+        while dirty:
+            cluster = [dirty.pop()]
+            for i, j in cluster:                        # The cluster grows as it is walked
+                for a in (i - 1, i, i + 1):
+                    for b in (j - 1, j, j + 1):
+                        if (a, b) in dirty:
+                            dirty.remove((a, b))
+                            cluster.append((a, b))
+            yield cluster
+
+    def edit(self, changes):
+        '''
+        Applies changes to the target, as a dict (or iterable of pairs) of (i, j): value, and returns the updated solution...
+        ... (self.S, which is updated in place)
+        '''
+        m = self.margin
+        dirty = set()
+        for (i, j), value in dict(changes).items():
+            self.T[i][j] = value
+            dirty.update((a, b) for a in range(max(0, i - m), min(self.height, i + m + 1))
+                         for b in range(max(0, j - m), min(self.width, j + m + 1)))
+        if not dirty:
+            return self.S
+        for piece_id in {self.S[a][b][1] for a, b in dirty} - {0}:
+            for a, b in self.cells(self.pieces.pop(piece_id)):
+                self.S[a][b] = (0, 0)
+                dirty.add((a, b))
+        for cluster in self.clusters(dirty):            # Edits far apart are re-solved separately, not in one box spanning both
+            self.solve_box(min(a for a, b in cluster), max(a for a, b in cluster) + 1,
+                           min(b for a, b in cluster), max(b for a, b in cluster) + 1)
+        return self.S
+
+    def solve_box(self, i0, i1, j0, j1):
+        '''Tiles the free target elements in rows i0:i1, columns j0:j1 around the pieces already placed'''
+        T = [[1 if self.T[a][b] and not self.S[a][b][1] else 0 for b in range(j0, j1)] for a in range(i0, i1)]
+        filled = [[1 if self.S[a][b][1] else 0 for b in range(j0, j1)] for a in range(i0, i1)]
+        for shape_id, i, j in RegionSolver(T, exact_size=self.exact_size, filled=filled).solve_placements():
+            placement = (shape_id, i + i0, j + j0)
+            self.pieces[self.next_id] = placement
+            for a, b in self.cells(placement):
+                self.S[a][b] = (shape_id, self.next_id)
+            self.next_id += 1
+
+
+def Tetris(T, workers=None, exact=False, time_limit=None, improve_time=None, beam_width=None, pieces=False, deadline=None):
+    '''
+    T is a list of lists, or a NumPy array of 0s and 1s (e.g. from load_target)
+    workers optionally solves large targets across that many processes (see RegionSolver and BandSolver)
+    Targets over 100 elements are split into regions (see RegionSolver) if they have at most RegionSolver.max_cells...
+    ... elements, or improve_time is given, and are otherwise solved greedily (BitboardSolver, or BandSolver given workers)
+    exact=True solves a target of any size perfectly with ExactSolver (returning an empty solution if that is impossible)
+    time_limit optionally bounds the recursive search of small targets (in seconds), returning the best partial solution found...
+    ... and the solving of regions of larger targets (see RegionSolver)
+    improve_time optionally spends that many seconds improving the greedy solution of large targets (see LocalSearch)
+    beam_width optionally solves large targets with BeamSolver instead, keeping that many partial tilings
+    pieces=True returns a PieceList (typed arrays of each piece's shape ID and root) rather than a solution matrix
+    deadline optionally races the greedy approach against an exact solver, returning the best solution found within...
+    ... that many seconds (or after a single greedy pass, if that takes longer; see PortfolioSolver)
+    '''
     height = len(T)
     width = len(T[0])
-    if height * width <= 100:       # For small problems, solve recursively
-        solver = RecuSolver(T)
-    else:                           # Otherwise, solve with greedy approach
-        solver = GreedySolver(T)
-    return solver.solve()
+    if exact:                       # Perfect tiling requested, regardless of size
+        solver = ExactSolver(T)
+    elif deadline:                  # Perfect tiling if one is found in time, otherwise the greedy solution
+        solver = PortfolioSolver(T, deadline)
+    elif height * width <= 100:     # For small problems, solve recursively
+        solver = RecuSolver(T, time_limit)
+    elif beam_width:                # Beam search requested, between greedy and exhaustive
+        solver = BeamSolver(T, beam_width)
+    elif improve_time or height * width <= RegionSolver.max_cells:     # Tile small regions perfectly, the rest greedily
+        solver = RegionSolver(T, workers, improve_time=improve_time, time_limit=time_limit)
+    elif workers and workers > 1:   # Otherwise, solve with the greedy approach, in bands across worker processes...
+        solver = BandSolver(T, workers)
+    else:                           # ... or in a single pass
+        solver = BitboardSolver(T)
+    return solver.solve_pieces() if pieces else solver.solve()
+
+
+'''
+Compact binary format, for moving large targets and solutions between pipeline stages without parsing or building tuples
+All integers are little-endian, and every file starts with a 16 byte header: a 4 byte magic, then uint32 height, uint32 width...
+... and a uint32 reserved (0)
+    - Target files (magic b'TTGT'): each row packed 8 elements per byte, first element in the most significant bit...
+      ... (numpy.packbits along rows), so each row is (width + 7) // 8 bytes
+    - Solution files (magic b'TSOL'): height * width int8 shape IDs in row-major order, zero padded to a multiple of 4 bytes...
+      ... then height * width int32 piece IDs (0s where there is no piece)
+The loaders memory-map the files, so nothing is read from disk until it is used
+'''
+
+target_magic = b'TTGT'
+solution_magic = b'TSOL'
+
+
+def write_header(path, magic, height, width):
+    with open(path, 'wb') as f:
+        f.write(magic + np.array([height, width, 0], dtype='<u4').tobytes())
+
+
+def read_header(path, magic):
+    '''Returns (height, width) from the header of a file, checking its magic'''
+    with open(path, 'rb') as f:
+        header = f.read(16)
+    if header[:4] != magic:
+        raise ValueError('{} is not a {} file'.format(path, magic.decode()))
+    height, width, _ = np.frombuffer(header, dtype='<u4', offset=4).tolist()
+    return height, width
+
+
+def write_target(path, T):
+    '''Writes a target (a list of lists, or an array of 0s and 1s) to a target file'''
+    T = np.asarray(T, dtype=np.uint8)
+    write_header(path, target_magic, *T.shape)
+    with open(path, 'ab') as f:
+        f.write(np.packbits(T, axis=1).tobytes())
+
+
+def open_target(path):
+    '''Memory-maps a target file, returning (packed, width) with packed a uint8 array of shape (height, (width + 7) // 8)'''
+    height, width = read_header(path, target_magic)
+    return np.memmap(path, dtype=np.uint8, mode='r', offset=16, shape=(height, (width + 7) // 8)), width
+
+
+def load_target(path):
+    '''Loads a target file as a (height, width) uint8 array, which Tetris and the solvers accept directly'''
+    packed, width = open_target(path)
+    return np.unpackbits(packed, axis=1, count=width)
+
+
+def iter_target_rows(path):
+    '''Yields the rows of a target file one at a time, unpacking each only when needed (e.g. for StreamSolver)'''
+    packed, width = open_target(path)
+    for row in packed:
+        yield np.unpackbits(row, count=width)
+
+
+def create_solution(path, height, width):
+    '''
+    Creates a solution file of (0, 0) elements, returning writable memory-mapped (shapes, pieces) arrays of shape (height, width)
+    e.g. a StreamSolver sink can write each row into these as it is finished, so the solution is never held in memory
+    '''
+    write_header(path, solution_magic, height, width)
+    size = height * width
+    with open(path, 'ab') as f:
+        f.truncate(16 + -(-size // 4) * 4 + 4 * size)
+    return map_solution(path, height, width, 'r+')
+
+
+def map_solution(path, height, width, mode):
+    size = height * width
+    shapes = np.memmap(path, dtype=np.int8, mode=mode, offset=16, shape=(height, width))
+    pieces = np.memmap(path, dtype='<i4', mode=mode, offset=16 + -(-size // 4) * 4, shape=(height, width))
+    return shapes, pieces
+
+
+def write_solution(path, S):
+    '''Writes a solution (a matrix of (shape_id, piece_id) tuples, or a (shapes, pieces) pair of arrays) to a solution file'''
+    shapes, pieces = solution_arrays(S) if not isinstance(S, tuple) else S
+    out = create_solution(path, *np.shape(shapes))
+    out[0][:] = shapes
+    out[1][:] = pieces
+    out[0].flush()
+    out[1].flush()
+
+
+def load_solution(path):
+    '''Memory-maps a solution file, returning read-only (shapes, pieces) arrays (which utils.check_solution accepts directly)'''
+    return map_solution(path, *read_header(path, solution_magic), 'r')
+
+
+def solution_arrays(S):
+    '''Converts a solution matrix of (shape_id, piece_id) tuples (or a PieceList) into int8 shape ID and int32 piece ID arrays'''
+    if isinstance(S, PieceList):
+        return S.arrays()
+    S = np.array(S, dtype=np.int32).reshape(len(S), -1, 2)
+    return S[:, :, 0].astype(np.int8), S[:, :, 1]
+
+
+def solution_matrix(shapes, pieces):
+    '''Converts (shapes, pieces) arrays back into a solution matrix of (shape_id, piece_id) tuples'''
+    return [list(zip(s, p)) for s, p in zip(np.asarray(shapes).tolist(), np.asarray(pieces).tolist())]
+
+
+class SolutionCache:
+    '''
+    Cache of Tetris solutions, keyed by a hash (BLAKE2b) of the packed target and the options passed to Tetris
+        - Solutions are held in memory as compact (shapes, pieces) arrays (see solution_arrays), least recently used first...
+          ... up to max_bytes in total, evicting the least recently used beyond that
+        - If path (a directory) is given, every solution is also written there as a solution file named by its key...
+          ... so it survives the process, and is loaded back into memory when it is next requested (this tier is not limited)
+    Use is counted in self.hits (found in memory), self.disk_hits (found on disk), self.misses and self.evictions
+    Results of time-limited solves (time_limit, improve_time) are cached like any other, so a repeat is not re-run for longer
+    '''
+    def __init__(self, max_bytes=256 * 2 ** 20, path=None):
+        self.entries = {}                               # Key: (shapes, pieces), least recently used first
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.path = path
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def key(self, T, options):
+        T = np.asarray(T, dtype=np.uint8)
+        h = hashlib.blake2b(np.array(T.shape, dtype='<u4').tobytes(), digest_size=16)
+        h.update(np.packbits(T, axis=None).tobytes())
+        defaults = {name: p.default for name, p in inspect.signature(Tetris).parameters.items()}
+        options = {name: value for name, value in options.items() if value != defaults.get(name)}  # Defaults given or not are alike
+        h.update(repr(sorted(options.items())).encode())
+        return h.hexdigest()
+
+    def solve(self, T, **options):
+        '''Returns the solution of Tetris(T, **options), from the cache if possible (as a new matrix or PieceList each time)'''
+        key = self.key(T, options)
+        expand = PieceList.from_solution if options.get('pieces') else lambda arrays: solution_matrix(*arrays)
+        if key in self.entries:
+            self.hits += 1
+            self.entries[key] = self.entries.pop(key)   # Move to the end, so it is evicted last
+            return expand(self.entries[key])
+        file = self.path and os.path.join(self.path, key + '.tsol')
+        if file and os.path.exists(file):
+            self.disk_hits += 1
+            self.add(key, tuple(np.array(a) for a in load_solution(file)))
+            return expand(self.entries[key])
+        self.misses += 1
+        S = Tetris(T, **options)
+        self.add(key, solution_arrays(S))
+        if file:                                        # A unique temporary name, as other processes may share path...
+            descriptor, temporary = tempfile.mkstemp(suffix='.tmp', dir=self.path)
+            os.close(descriptor)
+            try:
+                write_solution(temporary, self.entries[key])
+                os.replace(temporary, file)             # ... and never a partly written file under the key
+            except BaseException:
+                os.remove(temporary)
+                raise
+        return S
+
+    def add(self, key, arrays):
+        self.entries[key] = arrays
+        self.bytes += arrays[0].nbytes + arrays[1].nbytes
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            shapes, pieces = self.entries.pop(next(iter(self.entries)))
+            self.bytes -= shapes.nbytes + pieces.nbytes
+            self.evictions += 1
+
+
+def encode_target(T):
+    '''Packs a target into (height, width, bytes), with one bit per element, to send it to another process cheaply'''
+    return len(T), len(T[0]), np.packbits(np.asarray(T, dtype=np.uint8), axis=None).tobytes()
+
+
+def decode_target(encoded):
+    '''Unpacks a target packed by encode_target'''
+    height, width, data = encoded
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=height * width).reshape(height, width).tolist()
+
+
+def encode_solution(S):
+    '''Packs a solution matrix into bytes: an int32 (piece_id, shape_id, i, j) row for each piece, at its root'''
+    roots = {}
+    for i, row in enumerate(S):
+        for j, (shape_id, piece_id) in enumerate(row):
+            if piece_id and piece_id not in roots:      # The root is the first tile of each piece, top - bottom, left - right
+                roots[piece_id] = (piece_id, shape_id, i, j)
+    return np.array(list(roots.values()), dtype=np.int32).tobytes()
+
+
+def decode_solution(data, height, width):
+    '''Unpacks a solution packed by encode_solution into a solution matrix of (shape_id, piece_id) tuples'''
+    S = [(0, 0)] * (width * height)
+    for piece_id, shape_id, i, j in np.frombuffer(data, dtype=np.int32).reshape(-1, 4).tolist():
+        for p in Solver.shapes[shape_id].footprint:
+            S[(i + p[0]) * width + j + p[1]] = (shape_id, piece_id)
+    return [S[r:r + width] for r in range(0, len(S), width)]
+
+
+def solve_encoded(targets, options):
+    '''Worker function for Tetris_batch: solves a chunk of packed targets with Tetris, returning packed solutions'''
+    return [encode_solution(Tetris(decode_target(encoded), **options)) for encoded in targets]
+
+
+batch_pool = None               # Persistent pool used by Tetris_batch, as (workers, ProcessPoolExecutor)
+
+
+def get_batch_pool(workers):
+    '''Returns the persistent pool of worker processes, starting it (or restarting it with a new size) if needed'''
+    global batch_pool
+    if batch_pool is None or batch_pool[0] != workers:
+        if batch_pool is not None:
+            batch_pool[1].shutdown()
+        batch_pool = (workers, ProcessPoolExecutor(workers))
+    return batch_pool[1]
+
+
+def close_batch_pool():
+    '''Shuts down the persistent pool used by Tetris_batch (if it is running), waiting for its worker processes to exit'''
+    global batch_pool
+    if batch_pool is not None:
+        batch_pool[1].shutdown(cancel_futures=True)
+        batch_pool = None
+
+
+@contextmanager
+def batch_pool_open(workers=None):
+    '''
+    Starts the persistent pool for Tetris_batch, and shuts it down on exit, e.g.
+        with batch_pool_open(4):
+            for S in Tetris_batch(targets, workers=4): ...
+    '''
+    get_batch_pool(workers or os.cpu_count())
+    try:
+        yield
+    finally:
+        close_batch_pool()
+
+
+def Tetris_batch(targets, workers=None, ordered=True, chunksize=8, **options):
+    '''
+    Solves an iterable of targets across a persistent pool of worker processes, yielding the solutions as they are ready
+        - ordered=True yields each solution in the order of targets, otherwise (index, solution) pairs are yielded...
+          ... in the order they complete
+        - Targets are sent to the workers in chunks of chunksize, packed one bit per element (see encode_target)...
+          ... and solutions come back packed as one row per piece (see encode_solution)
+        - At most 4 chunks per worker are in flight at once, so targets can be a generator of any length
+        - options are passed on to Tetris (e.g. time_limit)
+    The pool stays up between calls, so each worker imports this module (building the lookup tables, and memoising...
+    ... BitboardSolver's window choices) only once, until close_batch_pool (or the end of a batch_pool_open block)
+    '''
+    workers = workers or os.cpu_count()
+    pool = get_batch_pool(workers)
+    targets = iter(targets)
+    pending = {}                                        # Chunk future: (index of first target, sizes of its targets)
+    order = []                                          # Futures in submission order, when ordered
+    index = 0
+    while True:
+        while len(pending) < 4 * workers:
+            chunk = list(islice(targets, chunksize))
+            if not chunk:
+                break
+            future = pool.submit(solve_encoded, [encode_target(T) for T in chunk], options)
+            pending[future] = (index, [(len(T), len(T[0])) for T in chunk])
+            if ordered:
+                order.append(future)
+            index += len(chunk)
+        if not pending:
+            return
+        if ordered:                                     # Wait for the oldest chunk
+            done = [order.pop(0)]
+        else:
+            done = wait(pending, return_when=FIRST_COMPLETED)[0]
+        for future in done:
+            start, sizes = pending.pop(future)
+            for k, (data, (height, width)) in enumerate(zip(future.result(), sizes)):
+                solution = decode_solution(data, height, width)
+                yield solution if ordered else (start + k, solution)
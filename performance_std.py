@@ -7,83 +7,159 @@
 #          Nicolas Rojas
 # ####################################################
 
-from main import Tetris
+'''
+Headless benchmark suite: sweeps grid sizes, densities, seeds and solvers, timing each case and checking its accuracy
+
+    python performance_std.py --sizes 10 40 100 --densities 0.6 0.8 --seeds 0 1 2 --output results.json
+    python performance_std.py --baseline baseline.json      (flags cases slower or less accurate than a stored run)
+    python performance_std.py --output baseline.json        (stores a new baseline)
+    python performance_std.py --sizes 1000 --densities 0.5 --solvers greedy bitboard    (speed-up of BitboardSolver)
+
+Each case is timed with time.perf_counter, after warm-up runs, as the median (and minimum) of several repeats
+Targets are generated with utils.generate_target_fast, so each (size, density, seed) gives the same target on every run
+The median speed-up of each solver against GreedySolver is printed too, over the cases both were run on
+(BitboardSolver reaches 1.6 - 1.7x on 1000 x 1000 targets, and 3.2 - 4.1x against GreedySolver before its lookup tables...
+... short of the 5x aimed for)
+Exits with status 1 if any case is invalid or has regressed, so it can be used as a check
+'''
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+os.environ.setdefault('MPLBACKEND', 'Agg')             # Never open plot windows (utils imports matplotlib)
+
+import numpy as np
+
 import utils
-import timeit
-from copy import deepcopy # copy 'target' to avoid modifying it
-
-the_forbidden_pieces = {1,2,3} #Forbidden shapeIDs
-
-# Example target shape, limit_tetris, and perfect_solution
-target = [
-            [0, 0, 1, 0, 0, 0],
-            [0, 0, 1, 0, 1, 0],
-            [0, 1, 1, 1, 1, 1],
-            [0, 1, 1, 1, 0, 0],
-            [1, 1, 1, 1, 1, 0]
-         ]
-         
-perfect_solution = [
-                    [(0, 0),  (0, 0),  (8, 1),  (0, 0),   (0, 0),  (0, 0)],
-                    [(0, 0),  (0, 0),  (8, 1),  (0, 0),   (13, 2), (0, 0)],
-                    [(0, 0),  (8, 1),  (8, 1),  (13, 2),  (13, 2), (13, 2)],
-                    [(0, 0),  (13, 3), (18, 4), (18, 4),  (0, 0),  (0, 0)],
-                    [(13, 3), (13, 3), (13, 3), (18, 4),  (18, 4), (0, 0)]
-                   ]
-
-# NOTE: This example is used for the mock solution from 'main.py' only.
-
-# Uncomment the following line to generate a random target shape
-target, perfect_solution = utils.generate_target(width=40, height=40, density=0.8, forbidden_pieces=the_forbidden_pieces) # NOTE: it is recommended to keep density below 0.8
-
-solution = Tetris(deepcopy(target))
-valid, missing, excess, error_pieces = utils.check_solution(target, solution, the_forbidden_pieces)  # checks if the solution is valid
-
-if not valid or len(error_pieces)!=0:
-    if len(error_pieces) != 0:
-        print('WARNING: {} pieces have a wrong shapeID. They are labelled in image of the solution, and their PieceID are: {}.'
-                  .format(len(error_pieces), error_pieces))
-        print("Displaying solution...")
-        utils.visual_perfect(perfect_solution, solution, the_forbidden_pieces)
-    print("WARNING: The solution is not valid, no score will be given!")
-
-else:  # if the solution is valid, test time performance and accuracy
-
-    # TIME PERFORMANCE
-    # There will be three different 'target' with increasing complexity in real test.
-
-    time_set = timeit.timeit('Tetris({})'.format(target), 'from main import Tetris', number=1)
-    
-    if time_set > 600:
-
-        print("WARNING: Time is over 10 minutes! The solution is not valid")
-
-    else:
-
-        print("Time performance")
-        print("----------------")
-        print("The running time was {:.5f} seconds.\n".format(time_set))
-
-        # ACCURACY
-
-        print("Accuracy")
-        print("--------")
-
-        print('All pieces are labelled with correct shapeID and pieceID.')
-        print('No forbidden pieces are used.')
-        
-        total_blocks = sum([sum(row) for row in target])
-        total_blocks_solution = total_blocks - missing + excess
-
-        print("The number of blocks in the TARGET is {:.0f}.".format(total_blocks))
-        print("The number of blocks in the SOLUTION is {:.0f}.".format(total_blocks_solution))
-        print("There are {} MISSING blocks ({:.4f}%) and {} EXCESS blocks ({:.4f}%).\n".format
-              (missing, 100 * missing / total_blocks, excess, 100 * excess / total_blocks))
-
-        # VISUALISATION
-        # NOTE: for large sizes (e.g., 100x100), visualisation will take several seconds and might not be that helpful.
-        # Feel free to comment out the following lines if you don't need the visual feedback.
-
-        print("Displaying solution...")
-        utils.visualisation(target, solution, the_forbidden_pieces)
-        utils.visual_perfect(perfect_solution, solution, the_forbidden_pieces)
\ No newline at end of file
+from main import BitboardSolver, GreedySolver, RecuSolver, Tetris, VectorGreedySolver
+
+the_forbidden_pieces = {1, 2, 3}                        # Forbidden shapeIDs
+
+solvers = {                                             # Name: function solving a target (a list of lists)
+    'greedy': lambda T: GreedySolver(T).solve(),
+    'bitboard': lambda T: BitboardSolver(T).solve(),
+    'vector': lambda T: VectorGreedySolver(T).solve(),
+    'recu': lambda T: RecuSolver(T).solve(),
+    'tetris': lambda T: Tetris(T),
+}
+recu_max_size = 100                                     # RecuSolver is only benchmarked on targets of at most this many elements
+
+
+def run_case(solver, size, density, seed, warmup, repeat):
+    '''Times one solver on one generated (size x size) target, and checks the accuracy of its solution'''
+    target, _ = utils.generate_target_fast(size, size, density, the_forbidden_pieces, seed=seed)
+    target = target.tolist()
+    solve = solvers[solver]
+    for k in range(warmup):
+        solve([row[:] for row in target])
+    times = []
+    for k in range(repeat):
+        T = [row[:] for row in target]                  # Copied outside the timed region
+        start = time.perf_counter()
+        solution = solve(T)
+        times.append(time.perf_counter() - start)
+    valid, missing, excess, error_pieces = utils.check_solution(target, solution, the_forbidden_pieces)
+    total_blocks = max(int(np.sum(target)), 1)
+    return {
+        'solver': solver, 'size': size, 'density': density, 'seed': seed,
+        'times': times, 'median': statistics.median(times), 'min': min(times),
+        'valid': bool(valid and not error_pieces),
+        'missing_pct': 100 * (missing or 0) / total_blocks, 'excess_pct': 100 * (excess or 0) / total_blocks,
+    }
+
+
+def case_key(result):
+    return result['solver'], result['size'], result['density'], result['seed']
+
+
+def compare(results, baseline, tolerance, min_time):
+    '''
+    Returns a description of each regression against the baseline results: a case that is no longer valid, whose...
+    ... median time has grown by more than tolerance (ignoring differences under min_time seconds), or whose...
+    ... missing + excess percentage has grown
+    '''
+    previous = {case_key(r): r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        b = previous.get(case_key(r))
+        if b is None:
+            continue
+        name = '{} {}x{} density {} seed {}'.format(r['solver'], r['size'], r['size'], r['density'], r['seed'])
+        if b['valid'] and not r['valid']:
+            regressions.append('{}: solution is no longer valid'.format(name))
+        if r['median'] > b['median'] * (1 + tolerance) and r['median'] - b['median'] > min_time:
+            regressions.append('{}: {:.4f}s vs {:.4f}s ({:+.0f}%)'.format(
+                name, r['median'], b['median'], 100 * (r['median'] / b['median'] - 1)))
+        error, base_error = r['missing_pct'] + r['excess_pct'], b['missing_pct'] + b['excess_pct']
+        if error > base_error + 1e-9:
+            regressions.append('{}: {:.4f}% missing + excess vs {:.4f}%'.format(name, error, base_error))
+    return regressions
+
+
+def speedups(results, reference='greedy'):
+    '''Returns the median speed-up (reference median time / median time) of each solver over the cases both were run on'''
+    times = {case_key(r): r['median'] for r in results}
+    ratios = {}
+    for r in results:
+        base = times.get((reference,) + case_key(r)[1:])
+        if r['solver'] != reference and base:
+            ratios.setdefault(r['solver'], []).append(base / r['median'])
+    return {solver: statistics.median(x) for solver, x in ratios.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Tetriling solvers')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 40, 100], help='side lengths of the square targets')
+    parser.add_argument('--densities', type=float, nargs='+', default=[0.6, 0.8])
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2])
+    parser.add_argument('--solvers', nargs='+', default=list(solvers), choices=list(solvers))
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs before timing each case')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs of each case')
+    parser.add_argument('--output', help='file to write the results to (JSON)')
+    parser.add_argument('--baseline', help='results file (JSON) to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='fractional slow-down flagged as a regression')
+    parser.add_argument('--min-time', type=float, default=0.001, help='slow-downs under this many seconds are ignored')
+    args = parser.parse_args(argv)
+
+    results = []
+    print('{:<8} {:>9} {:>8} {:>5} {:>11} {:>11} {:>10} {:>10}'.format(
+        'solver', 'size', 'density', 'seed', 'median (s)', 'min (s)', 'missing %', 'excess %'))
+    for solver in args.solvers:
+        for size in args.sizes:
+            if solver == 'recu' and size * size > recu_max_size:
+                continue
+            for density in args.densities:
+                for seed in args.seeds:
+                    r = run_case(solver, size, density, seed, args.warmup, args.repeat)
+                    results.append(r)
+                    print('{:<8} {:>9} {:>8} {:>5} {:>11.5f} {:>11.5f} {:>10.4f} {:>10.4f}{}'.format(
+                        solver, '{0}x{0}'.format(size), density, seed, r['median'], r['min'],
+                        r['missing_pct'], r['excess_pct'], '' if r['valid'] else '  INVALID'))
+
+    ratios = speedups(results)
+    if ratios:
+        print('\nMedian speed-up against greedy: ' + ', '.join('{} {:.2f}x'.format(s, x) for s, x in ratios.items()))
+
+    failed = [r for r in results if not r['valid']]
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_time)
+        print('\n{} regression(s) against {}'.format(len(regressions), args.baseline))
+        for line in regressions:
+            print('    ' + line)
+    if args.output:
+        meta = {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'warmup': args.warmup, 'repeat': args.repeat}
+        with open(args.output, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=1)
+    return 1 if failed or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
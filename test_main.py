@@ -0,0 +1,360 @@
+'''
+Checks of the solvers in main.py: every solution is valid (see utils.check_solution), the greedy solvers give the same...
+... tiling as GreedySolver, and the exact solvers agree on which targets can be tiled perfectly
+Run with python -m pytest -q
+'''
+import multiprocessing
+import random
+import time
+
+import numpy as np
+import pytest
+
+import main
+import utils
+from main import (BandSolver, BeamSolver, BitboardSolver, ExactSolver, GreedySolver, LocalSearch, MultiStartSolver,
+                  PieceList, PortfolioSolver, RandomGreedySolver, RecuSolver, RegionSolver, SolutionCache, Solver,
+                  StreamSolver, Tetris, TetrisSession, Tetris_batch, VectorGreedySolver, batch_pool_open,
+                  iter_target_rows, load_solution, load_target, placements_to_solution, solution_matrix,
+                  write_solution, write_target)
+
+SIZES = [(1, 1), (3, 17), (20, 20), (37, 53)]                   # (height, width), including targets narrower than a piece
+
+
+def make_target(height, width, density=0.7, seed=0):
+    '''A solvable target (see utils.generate_target_fast), as a list of lists'''
+    return utils.generate_target_fast(width, height, density, set(), seed=seed)[0].tolist()
+
+
+def random_target(height, width, density=0.95, seed=0):
+    '''A target of random 1s, which may have no perfect tiling'''
+    rng = random.Random(seed)
+    return [[int(rng.random() < density) for j in range(width)] for i in range(height)]
+
+
+def check(T, solution):
+    '''Asserts the solution is valid, and returns its number of missing + excess elements'''
+    valid, missing, excess, error_pieces = utils.check_solution(T, solution, set())
+    assert valid and not error_pieces
+    return missing + excess
+
+
+def tiling(S):
+    '''The pieces of a solution, as sorted (shape_id, elements) pairs, so independent of the piece IDs'''
+    pieces = {}
+    for i, row in enumerate(S):
+        for j, (shape_id, piece_id) in enumerate(row):
+            if piece_id:
+                pieces.setdefault(piece_id, (shape_id, []))[1].append((i, j))
+    return sorted(pieces.values())
+
+
+@pytest.mark.parametrize('height, width', SIZES)
+def test_bitboard_matches_greedy(height, width):
+    T = make_target(height, width)
+    S = GreedySolver(T).solve()
+    check(T, S)
+    assert BitboardSolver(T).solve() == S
+
+
+@pytest.mark.parametrize('height, width', SIZES)
+def test_vector_matches_greedy(height, width):
+    T = make_target(height, width, seed=1)
+    S = VectorGreedySolver(T).solve()
+    check(T, S)
+    assert S == GreedySolver(T).solve()
+
+
+def test_band_solver():
+    T = make_target(60, 40, seed=2)
+    assert tiling(BandSolver(T, 1).solve()) == tiling(GreedySolver(T).solve())     # Pieces are renumbered by root
+    check(T, BandSolver(T, 2).solve())
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_exact_agrees_with_recursive(seed):
+    '''Both solvers tile a small target perfectly, or neither can'''
+    height, width = [(4, 4), (5, 6), (6, 6), (7, 8), (8, 8)][seed % 5]
+    T = random_target(height, width, seed=seed) if seed % 2 else make_target(height, width, 0.8, seed)
+    S = ExactSolver(T).solve()
+    assert (check(T, S) == 0) == (check(T, RecuSolver(T).solve()) == 0)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_region_solver(seed):
+    T = make_target(60, 60, 0.6, seed)
+    assert check(T, RegionSolver(T).solve()) <= check(T, GreedySolver(T).solve())
+
+
+def test_region_solver_time_limit():
+    '''Regions not reached within time_limit are solved greedily, so a tiny limit gives the greedy tiling'''
+    T = random_target(100, 100, 0.5)
+    placements = sorted(RegionSolver(T, time_limit=1e-9).solve_placements(), key=lambda p: (p[1], p[2]))
+    assert tiling(placements_to_solution(placements, 100, 100)) == tiling(BitboardSolver(T).solve())
+
+
+def test_tetris_solves_large_targets_greedily():
+    '''Decomposing costs more than it gains above RegionSolver.max_cells, so Tetris keeps the greedy solution there'''
+    T = make_target(RegionSolver.max_cells // 200 + 1, 200)
+    assert Tetris(T) == BitboardSolver(T).solve()
+
+
+def test_local_search():
+    T = make_target(40, 40, seed=3)
+    placements = [(shape_id, i - 2, j - 2) for shape_id, i, j in BitboardSolver(T).solve_placements()]
+    before = check(T, placements_to_solution(placements, 40, 40))
+    improved = LocalSearch(T, placements, time_limit=5).improve()
+    assert check(T, placements_to_solution(improved, 40, 40)) < before
+
+
+def test_local_search_time_limit():
+    '''The deadline holds however large the target, as only windows around errors are ranked'''
+    T = (np.random.default_rng(0).random((1000, 1000)) < 0.7).astype(np.uint8)
+    placements = [(shape_id, i - 2, j - 2) for shape_id, i, j in BitboardSolver(T).solve_placements()]
+    search = LocalSearch(T, placements, time_limit=0.05)
+    start = time.perf_counter()
+    search.improve()
+    assert time.perf_counter() - start < 0.5
+
+
+@pytest.mark.parametrize('height, width', SIZES)
+def test_stream_matches_greedy(height, width):
+    '''Pieces are numbered in order of placement, so only the tiling is the same as GreedySolver's'''
+    T = make_target(height, width, seed=4)
+    rows = []
+    assert StreamSolver(iter(T), width, sink=rows.append).solve() is None
+    check(T, rows)
+    assert tiling(rows) == tiling(GreedySolver(T).solve())
+
+
+def test_session_edits():
+    T = make_target(50, 50, seed=5)
+    session = TetrisSession(T)
+    rng = random.Random(5)
+    for k in range(5):
+        changes = {(rng.randrange(50), rng.randrange(50)): rng.randrange(2) for n in range(3)}
+        for (i, j), value in changes.items():
+            T[i][j] = value
+        check(T, session.edit(changes))
+
+
+def test_session_clusters():
+    '''Edits in opposite corners are re-solved as two small boxes, not one box over the whole target'''
+    T = make_target(100, 100, seed=6)
+    session = TetrisSession(T)
+    boxes = []
+    solve_box = session.solve_box
+    session.solve_box = lambda *box: boxes.append(box) or solve_box(*box)
+    T[2][2], T[97][97] = 1 - T[2][2], 1 - T[97][97]
+    check(T, session.edit({(2, 2): T[2][2], (97, 97): T[97][97]}))
+    assert len(boxes) == 2 and all(i1 - i0 < 20 and j1 - j0 < 20 for i0, i1, j0, j1 in boxes)
+
+
+def test_random_greedy_solver():
+    T = make_target(30, 30, seed=7)
+    S = RandomGreedySolver(T, seed=1).solve()
+    check(T, S)
+    assert RandomGreedySolver(T, seed=1).solve() == S
+
+
+def test_multi_start_solver():
+    '''Variant 0 is GreedySolver's own solution, so the best variant is never worse'''
+    T = make_target(30, 30, seed=7)
+    assert check(T, MultiStartSolver(T, workers=2, starts=4).solve()) <= check(T, GreedySolver(T).solve())
+
+
+@pytest.mark.parametrize('beam_width', [1, 8])
+def test_beam_solver(beam_width):
+    T = make_target(30, 40, seed=8)
+    check(T, BeamSolver(T, beam_width).solve())
+
+
+@pytest.mark.parametrize('make_solver', [GreedySolver, BitboardSolver, VectorGreedySolver, RegionSolver,
+                                         lambda T: BandSolver(T, 2), lambda T: StreamSolver(T, len(T[0]))])
+def test_solve_pieces(make_solver):
+    '''A PieceList expands to the same solution as solve, with the same piece IDs'''
+    T = make_target(40, 30, seed=9)
+    pieces = make_solver(T).solve_pieces()
+    check(T, pieces)
+    assert [list(row) for row in pieces] == make_solver(T).solve()
+
+
+class SleepingSolver:
+    '''An entrant that never finishes in time'''
+    def solve_pieces(self):
+        time.sleep(60)
+
+
+def test_portfolio_solver():
+    T = [[1] * 12 for i in range(12)]
+    T[0][0] = T[5][7] = T[10][3] = T[11][11] = 0
+    solver = PortfolioSolver(T, 1.0)
+    check(T, solver.solve())
+    T = make_target(12, 12, 0.9, seed=10)
+    solver = PortfolioSolver(T, 1.0)
+    assert check(T, solver.solve()) == 0 and solver.winner == 'exact'
+
+
+def test_portfolio_deadline():
+    '''Every entrant is stopped at the deadline, leaving the fallback solved in this process'''
+    T = make_target(20, 20, seed=11)
+    solver = PortfolioSolver(T, 0.2)
+    solver.end = time.perf_counter() + solver.deadline
+    results = solver.race({'greedy': SleepingSolver(), 'exact': SleepingSolver()}, fallback=BitboardSolver(T))
+    assert time.perf_counter() - solver.end < 1.0 and list(results) == ['fallback']
+
+
+@pytest.mark.parametrize('limits', [{'time_limit': 0.2}, {'node_limit': 2000}])
+def test_recursive_limits(limits):
+    '''A limited search returns a valid partial tiling in time, and never one worse than the greedy solution'''
+    T = random_target(10, 10, 0.9, seed=1)
+    solver = RecuSolver(T, pruning=(), **limits)
+    start = time.perf_counter()
+    S = solver.solve()
+    assert time.perf_counter() - start < 2.0 and not solver.perfect
+    assert solver.nodes <= limits.get('node_limit', solver.nodes) + 1
+    assert check(T, S) <= check(T, GreedySolver(T).solve())
+    check(T, placements_to_solution(solver.best, 10, 10, pad=2))
+
+
+def test_recursive_isolated_one():
+    '''A 1 no shape can cover ends the search at once, so the greedy solution is returned instead of an empty tiling'''
+    T = [[1, 0, 1, 1, 1, 1, 1, 1]] + [[0] * 8] + [[1] * 8 for i in range(8)]
+    solver = RecuSolver(T, time_limit=1)
+    assert solver.solve() == GreedySolver(T).solve() and solver.best == []
+
+
+def test_recursive_without_perfect_tiling():
+    '''With no perfect tiling, the limited search keeps covering 1s rather than pruning every shape near the end'''
+    T = random_target(10, 10, 0.9, seed=0)
+    assert sum(map(sum, T)) % 4
+    start = time.perf_counter()
+    assert check(T, RecuSolver(T).solve()) == check(T, GreedySolver(T).solve())     # No limit, so no search
+    assert time.perf_counter() - start < 0.5
+    assert check(T, RecuSolver(T, time_limit=0.5).solve()) < check(T, GreedySolver(T).solve())
+
+
+def test_batch_ordered():
+    targets = [make_target(5 + k, 12 - k, seed=k) for k in range(7)]
+    with batch_pool_open(2):
+        assert list(Tetris_batch(targets, workers=2, chunksize=2)) == [Tetris(T) for T in targets]
+        assert main.batch_pool is not None
+    assert main.batch_pool is None
+
+
+def test_batch_unordered():
+    targets = [make_target(20, 20 + k, seed=k) for k in range(9)]
+    with batch_pool_open(2):
+        results = list(Tetris_batch(iter(targets), workers=2, ordered=False, chunksize=2))
+    assert sorted(index for index, S in results) == list(range(9))
+    assert all(S == Tetris(targets[index]) for index, S in results)
+
+
+@pytest.mark.parametrize('height, width', [(7, 13), (1, 1), (16, 8)])     # Odd height * width, so the shape IDs are padded
+def test_binary_round_trip(tmp_path, height, width):
+    T = make_target(height, width, seed=12)
+    S = Tetris(T)
+    target_path, solution_path = str(tmp_path / 'target.bin'), str(tmp_path / 'solution.bin')
+    write_target(target_path, T)
+    write_solution(solution_path, S)
+    assert (tmp_path / 'target.bin').stat().st_size == 16 + height * ((width + 7) // 8)
+    assert (tmp_path / 'solution.bin').stat().st_size == 16 + -(-height * width // 4) * 4 + 4 * height * width
+    assert load_target(target_path).tolist() == T
+    assert [row.tolist() for row in iter_target_rows(target_path)] == T
+    assert solution_matrix(*load_solution(solution_path)) == S
+    with pytest.raises(ValueError):
+        load_solution(target_path)
+
+
+def test_binary_arrays_are_accepted(tmp_path):
+    '''Tetris takes a loaded target, and utils.check_solution the memory-mapped solution arrays, without conversion'''
+    T = make_target(30, 21, seed=13)
+    write_target(str(tmp_path / 'target.bin'), T)
+    S = Tetris(load_target(str(tmp_path / 'target.bin')))
+    assert S == Tetris(T)
+    write_solution(str(tmp_path / 'solution.bin'), S)
+    shapes, pieces = load_solution(str(tmp_path / 'solution.bin'))
+    assert isinstance(pieces, np.memmap)
+    assert utils.check_solution(T, (shapes, pieces), set()) == utils.check_solution(T, S, set())
+
+
+def checker_case():
+    '''A 4 x 8 target with one 1 left missing, and a solution of two pieces: shape 4 (piece 1) and shape 11 (piece 2)'''
+    S = [[(0, 0)] * 8 for i in range(4)]
+    for shape_id, piece_id, i, j in ((4, 1, 0, 0), (11, 2, 0, 4)):
+        for p in Solver.shapes[shape_id].footprint:
+            S[i + p[0]][j + p[1]] = (shape_id, piece_id)
+    T = [[int(piece_id > 0) for shape_id, piece_id in row] for row in S]
+    T[3][7] = 1
+    return T, S
+
+
+@pytest.mark.parametrize('change, forbidden, expected', [
+    ({}, set(), (True, 1, 0, [])),
+    ({(2, 1): (0, 0)}, set(), (False, 2, 0, [])),                       # Piece 1 has 3 blocks
+    ({(3, 0): (4, 1)}, set(), (False, 1, 1, [])),                       # Piece 1 has 5 blocks, one on a 0
+    ({(1, 0): (5, 1)}, set(), (False, 1, 0, [])),                       # Mixed shape IDs in piece 1
+    ({}, {11}, (False, 1, 0, [])),                                      # Forbidden shape
+    ({(0, 0): (4, 0)}, set(), (False, 1, 0, [])),                       # Piece ID 0
+    ({(0, 0): (0, 1)}, set(), (False, 1, 0, [])),                       # Shape ID 0
+    ({(0, 4): (13, 2), (1, 4): (13, 2), (1, 5): (13, 2), (1, 6): (13, 2)}, set(), (False, 1, 0, [2])),   # Wrong shape
+])
+def test_checker(change, forbidden, expected):
+    T, S = checker_case()
+    for (i, j), element in change.items():
+        S[i][j] = element
+    assert utils.check_solution(T, S, forbidden) == expected
+
+
+def test_checker_error_order(capsys):
+    '''Pieces are checked one at a time, so piece 1 (with the positions of a forbidden shape) is reported before piece 2...
+    ... (with 3 blocks)'''
+    T, S = checker_case()
+    S[0][0], S[1][0], S[2][0], S[2][1] = [(6, 1)] * 4
+    S[1][6] = (0, 0)
+    assert utils.check_solution(T, S, {4}) == (False, 2, 0, [])
+    assert 'forbidden piece (shapeID 4)' in capsys.readouterr().out
+
+
+def test_cache_hits_and_misses():
+    T = make_target(20, 20, seed=14)
+    cache = SolutionCache()
+    assert cache.solve(T) == Tetris(T)
+    assert cache.solve(np.array(T, dtype=np.uint8), workers=None) == Tetris(T)    # Default options are the same key
+    assert (cache.hits, cache.misses) == (1, 1)
+    pieces = cache.solve(T, pieces=True)
+    assert isinstance(pieces, PieceList) and [list(row) for row in pieces] == Tetris(T)
+    assert cache.misses == 2                                                        # pieces=True is a different key
+
+
+def test_cache_eviction():
+    targets = [make_target(10, 10, seed=k) for k in range(3)]
+    size = 10 * 10 * 5                                                              # int8 shape IDs and int32 piece IDs
+    cache = SolutionCache(max_bytes=2 * size)
+    for T in targets:
+        cache.solve(T)
+    assert (cache.evictions, cache.bytes, len(cache.entries)) == (1, 2 * size, 2)
+    cache.solve(targets[1])                                                         # Now the most recently used...
+    cache.solve(targets[0])                                                         # ... so targets[2] is evicted
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 4, 2)
+    cache.solve(targets[1])
+    assert cache.hits == 2
+
+
+def test_cache_disk(tmp_path):
+    T = make_target(12, 9, seed=15)
+    SolutionCache(path=str(tmp_path)).solve(T)
+    assert [f.suffix for f in tmp_path.iterdir()] == ['.tsol']                     # No temporary files left behind
+    cache = SolutionCache(path=str(tmp_path))
+    assert cache.solve(T) == Tetris(T)
+    assert (cache.disk_hits, cache.misses) == (1, 0)
+    cache.solve(T)
+    assert cache.hits == 1
+
+
+def test_multi_start_time_limit():
+    '''Workers still solving variants at the time limit are terminated, not left running'''
+    T = make_target(150, 150, seed=16)
+    start = time.perf_counter()
+    check(T, MultiStartSolver(T, workers=2, time_limit=0.1).solve())
+    assert time.perf_counter() - start < 3.0 and not multiprocessing.active_children()
@@ -13,36 +13,50 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 import numpy as np
 from PIL import Image, ImageDraw
-import operator
 import random
+from itertools import chain
 
 """
  ------------------------------- MAIN UTIL FUNCTIONS ------------------------------- 
  The functions below are used in the performance test. They are useful tools that 
  may help you to test your algorithm. They are the following:
  
-    check_solution(target, solution, forbidden_pieces): checks if a solution is valid
+    check_solution(target, solution, forbidden_pieces): checks if a solution is valid (a matrix, or a list of pieces)
     
     generate_target(width, height, density, forbidden_pieces): generates a random solvable target shape
     
+    generate_target_fast(width, height, density, forbidden_pieces, seed): same, much faster and up to higher densities
+    
     visualisation(target, solution, forbidden_pieces): displays the target vs the solution
     
     visual_perfect(perfect, solution, forbidden_pieces): displays the perfect_solution vs the solution
     
+    render_solution(target, solution, forbidden_pieces, path): writes the target vs the solution to a PNG file (no display needed)
+    
+    render_perfect(perfect, solution, forbidden_pieces, path): writes the perfect_solution vs the solution to a PNG file
+    
 """
 
 
 def check_solution(target, solution, forbidden_pieces):
     """
     Check if a solution is valid
-    :param target: target shape
-    :param solution: student's solution
+    :param target: target shape (a list of lists, or an array of 0s and 1s)
+    :param solution: student's solution (a matrix of (shapeID, pieceID) tuples, a (shapes, pieces) pair of arrays, or a
+                     piece list, see checkpieces)
     :param forbidden_pieces: set of forbidden shapeIDs 
     :return: valid: True or False
     :return: missing: number of missing blocks
     :return: excess: number of excess blocks
     :return: error_pieces: list of wrongly labelled pieces
     """
+    if hasattr(solution, 'shape_ids'):
+        missing, excess = checkpieces(target, solution, forbidden_pieces)
+        return missing is not None, missing, excess, []  # a piece list has no labels to get wrong
+
+    if not isinstance(solution, tuple) and len({len(row) for row in solution}) == 1:
+        shapes, pieces, _, _ = solution_arrays(solution)  # convert once, for both checks below
+        solution = (shapes.reshape(len(solution), -1), pieces.reshape(len(solution), -1))
 
     valid = True
     missing, excess = boundary_check(target, solution)
@@ -101,13 +115,86 @@ def generate_target(width, height, density, forbidden_pieces):
     return target, solution
 
 
-def visualisation(target, solution, forbidden_pieces):
+def generate_target_fast(width, height, density, forbidden_pieces, seed=None):
+    """
+    Generates a random solvable target shape, in constant time per piece, at densities up to about 0.98
+    Pieces are packed top-bottom, left-right: each free block becomes the first block of a random allowed shape that fits
+    (preferring shapes that leave no free block cut off from all others), and is only left empty if no shape fits. Random
+    pieces are then removed until the density is reached (densities above that of the packing return the whole packing)
+    :param width: number of columns of the target (must be positive)
+    :param height: number of rows of the target (must be positive)
+    :param density: fraction of the target to fill (must be between 0 and 1)
+    :param forbidden_pieces: set of forbidden shapeIDs
+    :param seed: seed for the random number generator, to generate the same target again
+    :return: target: (height, width) uint8 array
+    :return: solution: (shapes, pieces) pair of int8 and int32 arrays (see main.write_target and main.write_solution)
+    """
+    assert width > 0, "width must be a positive integer"
+    assert height > 0, "height must be a positive integer"
+    assert 0 <= density <= 1, "density must be a number between 0 and 1"
+    rng = random.Random(seed)
+    stride = width + 5  # 2 padding columns on the left and 3 on the right, 1 padding row above and 3 below
+    free = bytearray(stride * (height + 4))
+    for r in range(1, height + 1):
+        free[r * stride + 2:r * stride + 2 + width] = b'\x01' * width
+    shape_ids = sorted(set(range(1, 20)) - forbidden_pieces)
+    offsets = {shapeid: [y * stride + x for [y, x] in generate_shape(shapeid)] for shapeid in shape_ids}
+    around = {shapeid: sorted({o + d for o in offsets[shapeid] for d in (1, -1, stride)} - set(offsets[shapeid]))
+              for shapeid in shape_ids}  # free blocks next to a new piece, which could be cut off by it
+
+    roots = []
+    for k in range(stride, len(free)):
+        if not free[k]:
+            continue
+        rng.shuffle(shape_ids)
+        fallback = None
+        for shapeid in shape_ids:
+            _, a, b, c = offsets[shapeid]
+            if free[k + a] and free[k + b] and free[k + c]:
+                free[k] = free[k + a] = free[k + b] = free[k + c] = 0
+                if all(not free[q] or free[q + 1] or free[q - 1] or free[q + stride] or free[q - stride]
+                       for q in [k + o for o in around[shapeid]]):
+                    roots.append((k, shapeid))
+                    break
+                free[k] = free[k + a] = free[k + b] = free[k + c] = 1
+                if fallback is None:
+                    fallback = shapeid
+        else:
+            if fallback is not None:
+                _, a, b, c = offsets[fallback]
+                free[k] = free[k + a] = free[k + b] = free[k + c] = 0
+                roots.append((k, fallback))
+
+    npieces = int(width * height * density) // 4
+    if npieces < len(roots):
+        roots = [roots[n] for n in sorted(rng.sample(range(len(roots)), npieces))]
+
+    shapes = np.zeros(len(free), dtype=np.int8)
+    pieces = np.zeros(len(free), dtype=np.int32)
+    if roots:
+        table = np.zeros((20, 4), dtype=np.int64)
+        for shapeid in offsets:
+            table[shapeid] = offsets[shapeid]
+        k, shapeid = np.array(roots, dtype=np.int64).T
+        cells = k[:, None] + table[shapeid]
+        shapes[cells] = shapeid[:, None]
+        pieces[cells] = np.arange(1, len(roots) + 1, dtype=np.int32)[:, None]
+    shapes = shapes.reshape(height + 4, stride)[1:height + 1, 2:width + 2]
+    pieces = pieces.reshape(height + 4, stride)[1:height + 1, 2:width + 2]
+    target = (pieces != 0).astype(np.uint8)
+    return target, (np.ascontiguousarray(shapes), np.ascontiguousarray(pieces))
+
+
+def visualisation(target, solution, forbidden_pieces, path=None):
     """
     Displays the target vs the solution
     :param target: target shape
     :param solution: student's solution
     :param forbidden_pieces: set of forbidden shapeIDs 
+    :param path: if given, the images are written to this PNG file instead (see render_solution)
     """
+    if path is not None:
+        return render_solution(target, solution, forbidden_pieces, path)
     wrong_list = checkshape(solution, forbidden_pieces)
     Ty_len = len(target)
     Tx_len = len(target[0])
@@ -156,13 +243,16 @@ def visualisation(target, solution, forbidden_pieces):
     ax2.invert_yaxis()
     plt.show()
 
-def visual_perfect(perfect, solution, forbidden_pieces):
+def visual_perfect(perfect, solution, forbidden_pieces, path=None):
     """
     Displays the perfect_solution vs the solution
     :param perfect: perfect solution
     :param solution: student's solution
     :param forbidden_pieces: set of forbidden shapeIDs 
+    :param path: if given, the images are written to this PNG file instead (see render_perfect)
     """
+    if path is not None:
+        return render_perfect(perfect, solution, forbidden_pieces, path)
     wrong_list = checkshape(solution, forbidden_pieces)
     Ty_len = len(perfect)
     Tx_len = len(perfect[0])
@@ -216,6 +306,36 @@ def visual_perfect(perfect, solution, forbidden_pieces):
 
 
 
+def render_solution(target, solution, forbidden_pieces, path, cell=4, max_side=None):
+    """
+    Writes the target (blue blocks) next to the solution (a colour per piece, wrongly shaped pieces in red) to a PNG file
+    The images are built as NumPy arrays in one pass and saved with PIL, so no display is needed, even for large sizes
+    :param target: target shape
+    :param solution: student's solution
+    :param forbidden_pieces: set of forbidden shapeIDs
+    :param path: PNG file to write
+    :param cell: side of each block in pixels (with a 1 pixel gap between blocks if 3 or more)
+    :param max_side: if given, the image is scaled down so that neither side is longer than this many pixels
+    """
+    target = np.asarray(target, dtype=np.uint8)
+    left = np.full(target.shape + (3,), 255, dtype=np.uint8)
+    left[target == 1] = (0, 0, 255)
+    write_png([left, solution_image(solution, forbidden_pieces)], path, cell, max_side)
+
+
+def render_perfect(perfect, solution, forbidden_pieces, path, cell=4, max_side=None):
+    """
+    Writes the perfect_solution next to the solution to a PNG file, as in render_solution
+    :param perfect: perfect solution
+    :param solution: student's solution
+    :param forbidden_pieces: set of forbidden shapeIDs
+    :param path: PNG file to write
+    :param cell: side of each block in pixels
+    :param max_side: if given, the image is scaled down so that neither side is longer than this many pixels
+    """
+    write_png([solution_image(perfect, set()), solution_image(solution, forbidden_pieces)], path, cell, max_side)
+
+
 """
  ------------------------------- AUXILIARY FUNCTIONS ------------------------------- 
  The functions below are used by the main functions above, and you shouldn't need
@@ -223,6 +343,64 @@ def visual_perfect(perfect, solution, forbidden_pieces):
 """
 
 
+# relative (x, y) positions of the last three blocks of each shape to the first, with blocks sorted top-bottom, left-right
+goldenpositions = {
+    1: [[1, 0], [0, 1], [1, 1]],
+    2: [[0, 1], [0, 2], [0, 3]],
+    3: [[1, 0], [2, 0], [3, 0]],
+    4: [[0, 1], [0, 2], [1, 2]],
+    5: [[-2, 1], [-1, 1], [0, 1]],
+    6: [[1, 0], [1, 1], [1, 2]],
+    7: [[1, 0], [2, 0], [0, 1]],
+    8: [[0, 1], [-1, 2], [0, 2]],
+    9: [[1, 0], [2, 0], [2, 1]],
+    10: [[1, 0], [0, 1], [0, 2]],
+    11: [[0, 1], [1, 1], [2, 1]],
+    12: [[0, 1], [1, 1], [0, 2]],
+    13: [[-1, 1], [0, 1], [1, 1]],
+    14: [[-1, 1], [0, 1], [0, 2]],
+    15: [[1, 0], [2, 0], [1, 1]],
+    16: [[1, 0], [-1, 1], [0, 1]],
+    17: [[0, 1], [1, 1], [1, 2]],
+    18: [[1, 0], [1, 1], [2, 1]],
+    19: [[-1, 1], [0, 1], [-1, 2]]
+}
+
+
+def position_codes(offsets):
+    """
+    Packs the relative positions of the last three blocks of each piece into a single integer
+    :param offsets: array of shape (pieces, 3, 2) of relative (x, y) positions
+    :return: array of codes, equal for equal positions (-1 where a block is 8 or more rows/columns from the first)
+    """
+    offsets = np.asarray(offsets, dtype=np.int64).reshape(-1, 3, 2)
+    v = (offsets[:, :, 0] + 8) * 16 + offsets[:, :, 1] + 8
+    codes = v[:, 0] << 16 | v[:, 1] << 8 | v[:, 2]
+    return np.where((np.abs(offsets) < 8).all(axis=(1, 2)), codes, -1)
+
+
+goldencodes = np.full(20, -2, dtype=np.int64)  # indexed by shapeID (-2 for 0, which matches no piece)
+goldencodes[1:] = position_codes([goldenpositions[shapeid] for shapeid in range(1, 20)])
+
+
+def solution_arrays(solution):
+    """
+    Flattens a solution into arrays of its blocks, top-bottom, left-right
+    :param solution: matrix of (shapeid, pieceid) tuples, or a (shapes, pieces) pair of arrays
+    :return: shapes, pieces, ys, xs: the shapeID, pieceID, row and column of each block
+    """
+    if isinstance(solution, tuple):
+        shapes, pieces = np.asarray(solution[0]), np.asarray(solution[1])
+        ys, xs = np.divmod(np.arange(shapes.size), max(shapes.shape[1], 1))
+        return shapes.ravel().astype(np.int64), pieces.ravel().astype(np.int64), ys, xs
+    lengths = np.array([len(row) for row in solution], dtype=np.int64)  # rows may differ in length
+    size = int(lengths.sum())
+    cells = np.fromiter(chain.from_iterable(chain.from_iterable(solution)), dtype=np.int64, count=2 * size)
+    ys = np.repeat(np.arange(len(solution)), lengths)
+    xs = np.arange(size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return cells[0::2], cells[1::2], ys, xs
+
+
 def boundary_check(target, solution):
     """
     Counts the missing and excess blocks
@@ -232,138 +410,215 @@ def boundary_check(target, solution):
     :return: excess: number of excess blocks
     """
 
-    missing = 0
-    excess = 0
-
     height = len(target)
     width = len(target[0])
 
-    if len(solution) != height:
+    if isinstance(solution, tuple):
+        solution_widths = [np.shape(solution[0])[1]] * np.shape(solution[0])[0]
+    else:
+        solution_widths = [len(row) for row in solution]
+
+    if len(solution_widths) != height:
         print("ERROR: The target and the solution are not the same size (target's height = {}, solution's height = {})."
-              .format(height, len(solution)))
+              .format(height, len(solution_widths)))
         return None, None
 
     for r in range(0, height):
 
-        if len(target[r]) != width or len(solution[r]) != width:
+        if len(target[r]) != width or solution_widths[r] != width:
             print("ERROR in row {}: The target and the solution are not the same size (target's width = {}, solution's "
-                  "width = {}).".format(r, len(target[r]), len(solution[r])))
+                  "width = {}).".format(r, len(target[r]), solution_widths[r]))
             return None, None
 
-        for c in range(0, width):
+    target = np.asarray(target)
+    wrong = (target != 0) & (target != 1)
+    if wrong.any():
+        r, c = np.argwhere(wrong)[0]
+        print("ERROR in coordinates [x={}, y={}]: target block is {}, when it should be either 0 or 1"
+              .format(c, r, target[r][c]))
+        return None, None
 
-            if target[r][c] == 0:
-                if solution[r][c] != (0, 0):
-                    excess += 1
-            elif target[r][c] == 1:
-                if solution[r][c] == (0, 0):
-                    missing += 1
-            else:
-                print("ERROR in coordinates [x={}, y={}]: target block is {}, when it should be either 0 or 1"
-                      .format(c, r, target[r][c]))
-                return None, None
+    shapes, pieces, _, _ = solution_arrays(solution)
+    empty = ((shapes == 0) & (pieces == 0)).reshape(height, width)
+    missing = int(np.count_nonzero(empty & (target == 1)))
+    excess = int(np.count_nonzero(~empty & (target == 0)))
 
     return missing, excess
 
 
-def checkposition(positions, shapeid, forbidden_pieces):
-    """
-    Check if positions of a piece corresponds with a specific shape
-    :param positions: positions of blocks of a piece
-    :param shapeid: the specified shape for this piece
-    :param forbidden_pieces: set of forbidden shapeIDs
-    :return: whether or not the positions are correct
-    """
-    # the relative position of the last three node to the first node
-    goldenpositions = {
-        1: np.array([[1, 0], [0, 1], [1, 1]]),
-        2: np.array([[0, 1], [0, 2], [0, 3]]),
-        3: np.array([[1, 0], [2, 0], [3, 0]]),
-        4: np.array([[0, 1], [0, 2], [1, 2]]),
-        5: np.array([[-2, 1], [-1, 1], [0, 1]]),
-        6: np.array([[1, 0], [1, 1], [1, 2]]),
-        7: np.array([[1, 0], [2, 0], [0, 1]]),
-        8: np.array([[0, 1], [-1, 2], [0, 2]]),
-        9: np.array([[1, 0], [2, 0], [2, 1]]),
-        10: np.array([[1, 0], [0, 1], [0, 2]]),
-        11: np.array([[0, 1], [1, 1], [2, 1]]),
-        12: np.array([[0, 1], [1, 1], [0, 2]]),
-        13: np.array([[-1, 1], [0, 1], [1, 1]]),
-        14: np.array([[-1, 1], [0, 1], [0, 2]]),
-        15: np.array([[1, 0], [2, 0], [1, 1]]),
-        16: np.array([[1, 0], [-1, 1], [0, 1]]),
-        17: np.array([[0, 1], [1, 1], [1, 2]]),
-        18: np.array([[1, 0], [1, 1], [2, 1]]),
-        19: np.array([[-1, 1], [0, 1], [-1, 2]])
-    }
-
-    matchM = (np.array(positions[1:])-np.array(positions[0]) == goldenpositions[shapeid])
-    forbidden = False
-    if not np.all(matchM):
-        for f_pieces in forbidden_pieces:
-            if np.all(np.array(positions[1:])-np.array(positions[0]) == goldenpositions[f_pieces]):
-                print("ERROR, forbidden piece (shapeID {}) detected in position {}." .format(f_pieces, positions)) 
-                forbidden = True
- 
-    return np.all(matchM), forbidden
-
-
 def checkshape(solution, forbidden_pieces):
     """
     Check if the pieces have the correct shape
-    :param solution: matrix containing the information of pieces, (shapeid, pieceid)
+    :param solution: matrix containing the information of pieces, (shapeid, pieceid), or a (shapes, pieces) pair of arrays
     :param forbidden_pieces: set of forbidden shapeIDs 
     :return:  id of pieces whose positions don't correspond with its shape
     """
-    error_pieces = []
-    Pieces = {}  # dictionary of pieces
-
-    # extract all pieces from Matrix, and save their shapes and positions into Pieces
-    for y, row in enumerate(solution):
-        for x, point in enumerate(row):
-            shapeid = point[0]
-            pieceid = point[1]
-            if 0 in [pieceid, shapeid]:
-                if pieceid != 0:
-                    print("ERROR in coordinates [x={}, y={}]: shapeID is 0, but shapeID should be greater than 0.".format(
-                        x, y))
-                    return None
-                elif shapeid != 0:
-                    print("ERROR in coordinates [x={}, y={}]: pieceID is 0, but pieceID should be greater than 0.".format(
-                        x, y))
-                    return None
-                continue
-            elif shapeid in forbidden_pieces:
-                print("ERROR in pieces, there is a forbidden piece in the solution (shapeID = {}, pieceID = {}).".format(shapeid, pieceid))
-                return None
-            elif pieceid in Pieces:
-                shapeid2 = Pieces[pieceid]['shape']
-                if shapeid2 != shapeid:
-                    print("ERROR in coordinates [x={}, y={}]: shapeID is {}, but it belongs to piece {}, whose shapeID "
-                          "is {}.".format(x, y, shapeid, pieceid, shapeid2))
-                    return None
-                Pieces[pieceid]['node'].append((x, y))
-            else:
-                Pieces[pieceid] = {}
-                Pieces[pieceid]['shape'] = shapeid
-                Pieces[pieceid]['node'] = [(x, y)]
-
-    # for each piece sort poisitions (left-right,up-down), and check if the position is correct
-    for pid, piece in Pieces.items():
-        piece['node'].sort(key=operator.itemgetter(1, 0))
-        if len(piece['node']) != 4:
-            print("ERROR: Piece {} has {} blocks (it should have 4).".format(pid, len(piece['node'])))
-            return None
-        no_error_pieces, forbidden_detected = checkposition(piece['node'], piece['shape'], forbidden_pieces)
-        if no_error_pieces:
-            continue
+    shapes, pieces, ys, xs = solution_arrays(solution)
+
+    # group the blocks by piece (top-bottom, left-right within each piece), and take each piece's shape from its first block
+    blocks = np.flatnonzero(pieces)
+    order = blocks[np.argsort(pieces[blocks], kind='stable')]
+    pids, starts, counts = np.unique(pieces[order], return_index=True, return_counts=True)
+    firsts = order[starts]
+    shape_of = shapes[firsts]
+
+    # the first block (top-bottom, left-right) with an error in its IDs
+    zero_error = (shapes == 0) != (pieces == 0)
+    forbidden_error = (pieces != 0) & np.isin(shapes, list(forbidden_pieces))
+    shape_error = np.zeros(shapes.size, dtype=bool)
+    shape_error[order] = shapes[order] != np.repeat(shape_of, counts)
+    errors = zero_error | forbidden_error | shape_error
+    if errors.any():
+        k = int(np.argmax(errors))
+        x, y, shapeid, pieceid = int(xs[k]), int(ys[k]), int(shapes[k]), int(pieces[k])
+        if zero_error[k] and pieceid != 0:
+            print("ERROR in coordinates [x={}, y={}]: shapeID is 0, but shapeID should be greater than 0.".format(x, y))
+        elif zero_error[k]:
+            print("ERROR in coordinates [x={}, y={}]: pieceID is 0, but pieceID should be greater than 0.".format(x, y))
+        elif forbidden_error[k]:
+            print("ERROR in pieces, there is a forbidden piece in the solution (shapeID = {}, pieceID = {}).".format(shapeid, pieceid))
         else:
-            if forbidden_detected:
-                return None
-            else:
-                error_pieces.append(pid)
+            shapeid2 = int(shape_of[np.searchsorted(pids, pieceid)])
+            print("ERROR in coordinates [x={}, y={}]: shapeID is {}, but it belongs to piece {}, whose shapeID "
+                  "is {}.".format(x, y, shapeid, pieceid, shapeid2))
+        return None
+
+    # compare the positions of the blocks of each 4 block piece with those of its shape
+    four = np.flatnonzero(counts == 4)
+    cells = order[starts[four, None] + np.arange(4)]
+    offsets = np.stack([xs[cells[:, 1:]] - xs[cells[:, :1]], ys[cells[:, 1:]] - ys[cells[:, :1]]], axis=2)
+    codes = np.full(pids.size, -1, dtype=np.int64)
+    codes[four] = position_codes(offsets)
+    wrong = codes != goldencodes[np.where((shape_of >= 1) & (shape_of <= 19), shape_of, 0)]
+    forbidden_shape = np.zeros(pids.size, dtype=np.int64)  # the forbidden shape a wrong piece has the positions of, if any
+    for f_pieces in forbidden_pieces:
+        if 1 <= f_pieces <= 19:
+            forbidden_shape[wrong & (codes == goldencodes[f_pieces])] = f_pieces
+
+    # pieces are checked in the order of their first block, each for its size and then its positions, so the first
+    # error reported is the same as when checking one piece at a time
+    by_first = np.argsort(firsts)
+    stop = (counts[by_first] != 4) | (forbidden_shape[by_first] != 0)
+    if stop.any():
+        p = by_first[np.argmax(stop)]
+        if counts[p] != 4:
+            print("ERROR: Piece {} has {} blocks (it should have 4).".format(pids[p], counts[p]))
+        else:
+            positions = [(int(xs[c]), int(ys[c])) for c in cells[np.searchsorted(four, p)]]
+            print("ERROR, forbidden piece (shapeID {}) detected in position {}." .format(forbidden_shape[p], positions))
+        return None
+
+    return pids[by_first[wrong[by_first]]].tolist()
+
+def checkpieces(target, solution, forbidden_pieces):
+    """
+    Checks a solution given as a piece list, without expanding it into a matrix, and counts the missing and excess blocks
+    :param target: target shape
+    :param solution: piece list, with height and width, and shape_ids, rows and cols arrays giving the shapeID and the
+                     row and column of the first block (top-bottom, left-right) of each piece (e.g. main.PieceList)
+    :param forbidden_pieces: set of forbidden shapeIDs
+    :return: missing: number of missing blocks (None if the solution is invalid)
+    :return: excess: number of excess blocks (None if the solution is invalid)
+    """
+    height = len(target)
+    width = len(target[0])
+    if (solution.height, solution.width) != (height, width):
+        print("ERROR: The target and the solution are not the same size (target's size = {}x{}, solution's size = {}x{})."
+              .format(height, width, solution.height, solution.width))
+        return None, None
+
+    target = np.asarray(target)
+    wrong = (target != 0) & (target != 1)
+    if wrong.any():
+        r, c = np.argwhere(wrong)[0]
+        print("ERROR in coordinates [x={}, y={}]: target block is {}, when it should be either 0 or 1"
+              .format(c, r, target[r][c]))
+        return None, None
+
+    shapes = np.asarray(solution.shape_ids, dtype=np.int64)
+    pieceids = np.arange(1, shapes.size + 1)  # pieceIDs are 1, 2, ... in list order
+    unknown = (shapes < 1) | (shapes > 19)
+    if unknown.any():
+        p = int(np.argmax(unknown))
+        print("ERROR: Piece {} has shapeID {}, but shapeIDs are from 1 to 19.".format(pieceids[p], shapes[p]))
+        return None, None
+    forbidden = np.isin(shapes, list(forbidden_pieces))
+    if forbidden.any():
+        p = int(np.argmax(forbidden))
+        print("ERROR in pieces, there is a forbidden piece in the solution (shapeID = {}, pieceID = {}).".format(shapes[p], pieceids[p]))
+        return None, None
+
+    # the four blocks of each piece, from its first block and the positions of the rest relative to it
+    offsets = np.array([[[0, 0]] + goldenpositions[shapeid] for shapeid in range(1, 20)])
+    xs = np.asarray(solution.cols, dtype=np.int64)[:, None] + offsets[shapes - 1, :, 0]
+    ys = np.asarray(solution.rows, dtype=np.int64)[:, None] + offsets[shapes - 1, :, 1]
+    outside = ((xs < 0) | (xs >= width) | (ys < 0) | (ys >= height)).any(axis=1)
+    if outside.any():
+        p = int(np.argmax(outside))
+        print("ERROR: Piece {} (shapeID {}) lies outside the target, at {}.".format(
+            pieceids[p], shapes[p], list(zip(xs[p].tolist(), ys[p].tolist()))))
+        return None, None
+
+    cells = (ys * width + xs).ravel()
+    covered = np.bincount(cells, minlength=height * width)
+    if (covered > 1).any():
+        k = int(np.argmax(covered > 1))
+        y, x = divmod(k, width)
+        print("ERROR in coordinates [x={}, y={}]: pieces {} overlap.".format(x, y, (np.flatnonzero(cells == k) // 4 + 1).tolist()))
+        return None, None
+
+    covered = covered.reshape(height, width) > 0
+    missing = int(np.count_nonzero(~covered & (target == 1)))
+    excess = int(np.count_nonzero(covered & (target == 0)))
+    return missing, excess
+
+# colour of each piece, indexed by pieceID modulo its length (0 and wrongly shaped pieces are coloured separately)
+piececolours = np.random.RandomState(0).randint(40, 220, size=(4096, 3)).astype(np.uint8)
+piececolours[0] = (255, 255, 255)
+
+
+def solution_image(solution, forbidden_pieces):
+    """
+    Utility function called by render_solution and render_perfect
+    :param solution: matrix of (shapeid, pieceid) tuples, or a (shapes, pieces) pair of arrays
+    :param forbidden_pieces: set of forbidden shapeIDs
+    :return: RGB image of the solution, one pixel per block, with wrongly shaped pieces in red
+    """
+    height = len(solution[0]) if isinstance(solution, tuple) else len(solution)
+    _, pieces, _, _ = solution_arrays(solution)
+    pieces = pieces.reshape(height, -1)
+    colour_index = np.where(pieces == 0, 0, 1 + (pieces - 1) % (len(piececolours) - 1))
+    image = piececolours[colour_index]
+    wrong_list = checkshape(solution, forbidden_pieces)
+    if wrong_list:
+        image[np.isin(pieces, wrong_list)] = (255, 0, 0)
+    return image
+
+
+def write_png(images, path, cell, max_side):
+    """
+    Utility function called by render_solution and render_perfect: writes RGB images side by side (one pixel per block) to
+    a PNG file, scaled up to cell pixels per block and then down to fit within max_side
+    """
+    height = max(image.shape[0] for image in images)
+    gap = np.full((height, 1, 3), 255, dtype=np.uint8)
+    panels = []
+    for image in images:
+        panels += [np.pad(image, ((0, height - image.shape[0]), (0, 0), (0, 0)), constant_values=255), gap]
+    image = np.concatenate(panels[:-1], axis=1)
+    if max_side is not None:  # no bigger than needed before scaling down
+        cell = max(1, min(cell, max_side // max(image.shape[:2])))
+    if cell > 1:
+        image = np.repeat(np.repeat(image, cell, axis=0), cell, axis=1)
+        if cell >= 3:  # white gap between blocks
+            image[cell - 1::cell] = 255
+            image[:, cell - 1::cell] = 255
+    picture = Image.fromarray(image)
+    if max_side is not None and max(picture.size) > max_side:
+        ratio = max_side / max(picture.size)
+        picture = picture.resize((max(1, int(picture.size[0] * ratio)), max(1, int(picture.size[1] * ratio))), Image.BOX)
+    picture.save(path, format='PNG')
 
-    return error_pieces
 
 def check_if_piece_is_valid(piece, target):
     """